@@ -89,30 +89,47 @@ def merge_values(values, vm):
     return Union(values, vm)
 
 
-def get_views(variables, node, filter_strict=False):
+def get_views(variables, node, filter_strict=False, group_by_type=False):
   """Get all possible views of the given variables at a particular node.
 
+  Bindings that aren't visible at the node are pruned while the views are being
+  enumerated, so they don't count towards utils.DEEP_VARIABLE_LIMIT.
+
   Args:
     variables: The variables.
     node: The node.
     filter_strict: If True, emit a view only when node.HasCombination is
       satisfied; else, use the faster node.CanHaveCombination.
+    group_by_type: If True, emit only the first visible view for every
+      combination of type keys of the given variables' bindings. Use this if
+      the caller only cares about the types in a view, e.g. for matching.
 
   Yields:
     A variable->binding dictionary.
   """
   try:
-    combinations = utils.deep_variable_product(variables)
+    combinations = utils.deep_variable_product(
+        variables, value_filter=lambda value: node.CanHaveCombination([value]))
   except utils.TooComplexError:
     combinations = ((var.AddBinding(node.program.default_data, [], node)
                      for var in variables),)
+  variables = [var for var in variables if var.bindings]
+  # Maps a combination of type keys to the bindings we emitted views for.
+  type_key_owners = {}
   for combination in combinations:
     view = {value.variable: value for value in combination}
+    if group_by_type:
+      bindings = tuple(view[var] for var in variables)
+      type_key = tuple(b.data.get_type_key() for b in bindings)
+      if type_key_owners.get(type_key, bindings) != bindings:
+        log.debug("Skipping combination %r with known types", bindings)
+        continue
     combination = view.values()
-    check = node.HasCombination if filter_strict else node.CanHaveCombination
-    if not check(combination):
+    if filter_strict and not node.HasCombination(combination):
       log.info("Skipping combination %r", combination)
       continue
+    if group_by_type:
+      type_key_owners.setdefault(type_key, bindings)
     yield view
 
 
@@ -154,6 +171,9 @@ class AtomicAbstractValue(object):
     self.module = None
     self.official_name = None
     self.template = ()
+    # The dictionaries get_fullhash() walked, their changestamps at the time,
+    # and the resulting hash. See get_fullhash().
+    self._cached_fullhash = ((), [], None)
 
   @property
   def full_name(self):
@@ -166,8 +186,21 @@ class AtomicAbstractValue(object):
     return [self, self.vm.convert.object_type.data[0]]
 
   def get_fullhash(self):
-    """Hash this value and all of its children."""
+    """Hash this value and all of its children.
+
+    Children can only be added through the dictionaries in get_children_maps(),
+    which are MonitorDicts. So the hash stays valid as long as none of the
+    dictionaries we walked has a new changestamp, and we can check that without
+    walking the children again.
+
+    Returns:
+      A hash, as a str.
+    """
+    maps, changestamps, fullhash = self._cached_fullhash
+    if fullhash and [mapping.changestamp for mapping in maps] == changestamps:
+      return fullhash
     m = hashlib.md5()
+    maps = []
     seen_ids = set()
     stack = [self]
     while stack:
@@ -178,9 +211,13 @@ class AtomicAbstractValue(object):
       seen_ids.add(data_id)
       m.update(str(data_id))
       for mapping in data.get_children_maps():
+        maps.append(mapping)
         m.update(str(mapping.changestamp))
         stack.extend(mapping.data)
-    return m.digest()
+    fullhash = m.digest()
+    self._cached_fullhash = (
+        maps, [mapping.changestamp for mapping in maps], fullhash)
+    return fullhash
 
   def get_children_maps(self):
     """Get this value's dictionaries of children.
@@ -2145,8 +2182,6 @@ class InterpreterFunction(Function):
     vm: TypegraphVirtualMachine instance.
   """
 
-  _function_cache = {}
-
   @staticmethod
   def make_function(name, code, f_locals, f_globals, defaults, kw_defaults,
                     closure, annotations, late_annotations, vm):
@@ -2182,11 +2217,13 @@ class InterpreterFunction(Function):
                  for key, value in annotations.items()}, None),
                (dict(enumerate(defaults)), None),
                (dict(enumerate(closure or ())), None)))
-    if key not in InterpreterFunction._function_cache:
-      InterpreterFunction._function_cache[key] = InterpreterFunction(
+    # The cache lives on the VM: the code of __builtin__.py is shared between
+    # VMs, but functions are not, and must not outlive their VM.
+    if key not in vm.function_cache:
+      vm.function_cache[key] = InterpreterFunction(
           name, code, f_locals, f_globals, defaults, kw_defaults,
           closure, annotations, late_annotations, vm)
-    return InterpreterFunction._function_cache[key]
+    return vm.function_cache[key]
 
   @staticmethod
   def get_arg_count(code):
@@ -2211,7 +2248,12 @@ class InterpreterFunction(Function):
     self.kw_defaults = kw_defaults
     self.closure = closure
     self._call_cache = {}
+    self._call_summaries = {}
     self._call_records = []
+    self._global_names = set(self.code.co_names)
+    # The full hashes of the globals we use, and the hash computed from them.
+    # See _get_globals_hash().
+    self._cached_globals_hash = (None, None)
     self.nonstararg_count = self.code.co_argcount
     if self.code.co_kwonlyargcount >= 0:  # This is usually -1 or 0 (fast call)
       self.nonstararg_count += self.code.co_kwonlyargcount
@@ -2358,7 +2400,8 @@ class InterpreterFunction(Function):
       A hash of the dictionary.
     """
     if names is not None:
-      vardict = {name: vardict[name] for name in names.intersection(vardict)}
+      # names is usually much smaller than vardict (e.g. the globals).
+      vardict = {name: vardict[name] for name in names if name in vardict}
     m = hashlib.md5()
     for name, var in sorted(vardict.items()):
       m.update(str(name))
@@ -2372,6 +2415,93 @@ class InterpreterFunction(Function):
     return hashlib.md5("".join(InterpreterFunction._hash(*args)
                                for args in hash_args)).digest()
 
+  def _get_globals_hash(self):
+    """Hash the globals this function uses.
+
+    Unless one of those globals was reassigned or changed, this reuses the hash
+    computed for the previous call.
+
+    Returns:
+      A hash, as a str.
+    """
+    members = self.f_globals.members
+    fullhashes = [value.get_fullhash()
+                  for name in self._global_names if name in members
+                  for value in members[name].data]
+    old_fullhashes, globals_hash = self._cached_globals_hash
+    if fullhashes != old_fullhashes:
+      globals_hash = self._hash(members, self._global_names)
+      self._cached_globals_hash = (fullhashes, globals_hash)
+    return globals_hash
+
+  @staticmethod
+  def _summary_value_key(value, shallow=False):
+    """Compute the part of a summary key that describes one argument value."""
+    if isinstance(value, PythonConstant) and isinstance(
+        value.pyval, (int, long, float, complex, str, unicode)):
+      # Branches can depend on the exact value of a constant.
+      return value.get_type_key(), type(value.pyval), value.pyval
+    if type(value) is not Instance:  # pylint: disable=unidiomatic-typecheck
+      # Functions, classes, modules, containers of Variables etc. have the same
+      # type key as other values of their kind. Only share with this value.
+      return value
+    if shallow:
+      return value.get_type_key()
+    # Instances of the same class can have different attributes.
+    return value.get_type_key(), frozenset(
+        (name, frozenset(InterpreterFunction._summary_value_key(v, True)
+                         for v in var.data))
+        for name, var in value.members.items())
+
+  def _summary_key(self, callargs):
+    """Compute the key of a call in _call_summaries.
+
+    Calls are summarized by the types of their arguments (see get_type_key)
+    and of the arguments' attributes, together with the globals the function
+    uses.
+
+    Args:
+      callargs: A dictionary mapping parameter names to Variables.
+
+    Returns:
+      A hashable key, or None if the call shouldn't be summarized.
+    """
+    value_keys = []
+    for name, var in sorted(callargs.items()):
+      if any(isinstance(value, Unknown) for value in var.data):
+        # All unknowns have the same type key, but calls on them need to be
+        # recorded separately for solving.
+        return None
+      value_keys.append(
+          (name, frozenset(self._summary_value_key(v) for v in var.data)))
+    return tuple(value_keys), self._get_globals_hash()
+
+  def _get_state_hash(self, callargs):
+    """Hash everything reachable from the arguments and globals of a call."""
+    return (self._hash(callargs, None), self._get_globals_hash(),
+            self.f_globals.members.changestamp)
+
+  def _lookup_summary(self, node, callargs, summary_key):
+    """Answer a call from a summary of a previous call, if possible."""
+    if summary_key not in self._call_summaries:
+      return None
+    ret_data = self._call_summaries[summary_key]
+    log.info("Using the summary of a previous call to %r", self.name)
+    ret = self.vm.program.NewVariable(ret_data, [], node)
+    if self._store_call_records:
+      self._call_records.append((callargs, ret, node))
+    return node, ret
+
+  def _store_summary(self, callargs, summary_key, state_hash, ret):
+    """Summarize a call, unless it changed its arguments or globals."""
+    if state_hash != self._get_state_hash(callargs):
+      return
+    arg_data = {id(value) for var in callargs.values() for value in var.data}
+    if any(id(value) in arg_data for value in ret.data):
+      # Don't hand out one caller's argument as the result for another caller.
+      return
+    self._call_summaries[summary_key] = ret.data
+
   def _match_args(self, node, args):
     if not self.signature.has_param_annotations:
       return
@@ -2401,8 +2531,23 @@ class InterpreterFunction(Function):
 
   def call(self, node, _, args, new_locals=None):
     args = args.simplify(node)
+    use_summaries = (self.vm.options.call_summaries and not new_locals and
+                     not self.code.co_flags & loadmarshal.CodeType.CO_GENERATOR)
     if self.vm.is_at_maximum_depth() and self.name != "__init__":
+      if use_summaries and self._call_summaries:
+        # Instead of giving up, reuse what we learned from an earlier call.
+        try:
+          callargs = self._map_args(node, args)
+        except FailedFunctionCall:
+          pass
+        else:
+          summary_key = self._summary_key(callargs)
+          if summary_key:
+            result = self._lookup_summary(node, callargs, summary_key)
+            if result:
+              return result
       log.info("Maximum depth reached. Not analyzing %r", self.name)
+      self.vm.truncated_calls += 1
       if self.vm.callself_stack:
         for b in self.vm.callself_stack[-1].bindings:
           b.data.maybe_missing_members = True
@@ -2415,6 +2560,13 @@ class InterpreterFunction(Function):
         if name in self.signature.annotations:
           node, _, callargs[name] = self.vm.init_class(
               node, self.signature.annotations[name])
+    summary_key = self._summary_key(callargs) if use_summaries else None
+    if summary_key:
+      result = self._lookup_summary(node, callargs, summary_key)
+      if result:
+        return result
+      state_hash = self._get_state_hash(callargs)
+      truncated_calls = self.vm.truncated_calls
     # Might throw vm.RecursionException:
     frame = self.vm.make_frame(node, self.code, callargs,
                                self.f_globals, self.f_locals, self.closure,
@@ -2422,10 +2574,10 @@ class InterpreterFunction(Function):
     if self.signature.has_return_annotation:
       frame.allowed_returns = self.signature.annotations["return"]
     if self.vm.options.skip_repeat_calls:
-      callkey = self._hash_all(
-          (callargs, None),
-          (frame.f_globals.members, set(self.code.co_names)),
-          (frame.f_locals.members, set(self.code.co_varnames)))
+      callkey = hashlib.md5(
+          self._hash(callargs, None) + self._get_globals_hash() +
+          self._hash(frame.f_locals.members, set(self.code.co_varnames))
+      ).digest()
     else:
       # Make the callkey the number of times this function has been called so
       # that no call has the same key as a previous one.
@@ -2460,6 +2612,10 @@ class InterpreterFunction(Function):
     else:
       node_after_call, ret = self.vm.run_frame(frame, node)
     self._call_cache[callkey] = (callargs, ret, self.vm.remaining_depth())
+    if summary_key and truncated_calls == self.vm.truncated_calls:
+      # Only summarize calls that were analyzed completely, since the result of
+      # a truncated analysis depends on where the function was called from.
+      self._store_summary(callargs, summary_key, state_hash, ret)
     if self._store_call_records or self.vm.store_all_calls:
       self._call_records.append((callargs, ret, node_after_call))
     self.last_frame = frame
@@ -2666,6 +2822,7 @@ class Module(Instance):
 
   def _convert_member(self, name, ty):
     """Called to convert the items in _member_map to cfg.Variable."""
+    ty = self.vm.resolve_module_member(self, name, ty)
     if isinstance(ty, pytd.TypeParameter):
       self.vm.errorlog.not_supported_yet(self.vm.frame.current_opcode,
                                          "importing TypeVar")
@@ -154,6 +154,36 @@ class DictTest(AbstractTestBase):
     self.assertIs(True, self._d.compatible_with(False))
 
 
+class FullHashTest(AbstractTestBase):
+
+  def setUp(self):
+    super(FullHashTest, self).setUp()
+    self._outer = abstract.Instance(
+        self._vm.convert.object_type, self._vm, self._node)
+    self._inner = abstract.Instance(
+        self._vm.convert.object_type, self._vm, self._node)
+    self._outer.members["x"] = self.new_var(self._inner)
+
+  def test_unchanged(self):
+    self.assertEqual(self._outer.get_fullhash(), self._outer.get_fullhash())
+
+  def test_change_member(self):
+    fullhash = self._outer.get_fullhash()
+    self._outer.members["y"] = self.new_var(abstract.Unknown(self._vm))
+    self.assertNotEqual(fullhash, self._outer.get_fullhash())
+
+  def test_change_nested_member(self):
+    fullhash = self._outer.get_fullhash()
+    self._inner.members["y"] = self.new_var(abstract.Unknown(self._vm))
+    self.assertNotEqual(fullhash, self._outer.get_fullhash())
+
+  def test_add_binding(self):
+    fullhash = self._outer.get_fullhash()
+    self._outer.members["x"].AddBinding(
+        abstract.Unknown(self._vm), [], self._node)
+    self.assertNotEqual(fullhash, self._outer.get_fullhash())
+
+
 class IsInstanceTest(AbstractTestBase):
 
   def setUp(self):
@@ -319,6 +349,41 @@ class IsInstanceTest(AbstractTestBase):
                     self.new_var(self._int_class, self._obj_class)))
 
 
+class GetViewsTest(AbstractTestBase):
+  """Tests for abstract.get_views."""
+
+  def setUp(self):
+    super(GetViewsTest, self).setUp()
+    self._int_type = self._vm.convert.int_type
+    self._str_type = self._vm.convert.str_type
+
+  def _new_instance(self, cls):
+    return abstract.Instance(cls, self._vm, self._node)
+
+  def test_prune_invisible(self):
+    var = self._vm.program.NewVariable()
+    x = var.AddBinding(self._new_instance(self._int_type), [], self._node)
+    elsewhere = self._vm.program.NewCFGNode("elsewhere")
+    var.AddBinding(self._new_instance(self._str_type), [], elsewhere)
+    views = list(abstract.get_views([var], self._node))
+    self.assertEquals([x], [view[var] for view in views])
+
+  def test_all_invisible(self):
+    var = self._vm.program.NewVariable()
+    elsewhere = self._vm.program.NewCFGNode("elsewhere")
+    var.AddBinding(self._new_instance(self._int_type), [], elsewhere)
+    self.assertFalse(list(abstract.get_views([var], self._node)))
+
+  def test_group_by_type(self):
+    var = self._vm.program.NewVariable()
+    x1 = var.AddBinding(self._new_instance(self._int_type), [], self._node)
+    var.AddBinding(self._new_instance(self._int_type), [], self._node)
+    y = var.AddBinding(self._new_instance(self._str_type), [], self._node)
+    self.assertEquals(3, len(list(abstract.get_views([var], self._node))))
+    views = list(abstract.get_views([var], self._node, group_by_type=True))
+    self.assertItemsEqual([x1, y], [view[var] for view in views])
+
+
 class PyTDTest(AbstractTestBase):
   """Tests for abstract -> pytd type conversions."""
 
@@ -1,4 +1,5 @@
 """Abstract attribute handling."""
+import itertools
 import logging
 
 
@@ -14,6 +15,10 @@ class AbstractAttributeHandler(object):
 
   def __init__(self, vm):
     self.vm = vm
+    # Maps (class, attribute name) to the class's MRO, the number of leading
+    # MRO entries that don't have the attribute, the classes among them and
+    # the changestamps of those classes' members. See _get_mro_start().
+    self._mro_cache = {}
 
   def get_attribute_generic(self, node, obj, name, val):
     if isinstance(obj, abstract.ParameterizedClass):
@@ -287,23 +292,29 @@ class AbstractAttributeHandler(object):
     """Find an identifier in the MRO of the class."""
     ret = self.vm.program.NewVariable()
     add_origins = []
-    variableself = variablecls = None
     if valself:
       assert isinstance(valself, typegraph.Binding)
-      variableself = valself.AssignToNewVariable(node)
       add_origins.append(valself)
     if valcls:
       assert isinstance(valcls, typegraph.Binding)
-      variablecls = valcls.AssignToNewVariable(node)
       add_origins.append(valcls)
 
-    for base in obj.mro:
+    start_node = node
+    # Entries at the start of the MRO that don't have the attribute are skipped.
+    start = self._get_mro_start(obj, name)
+    for base in itertools.islice(obj.mro, start, None):
       # Potentially skip start of MRO, for super()
       if base is skip:
         continue
       node, var = self._get_attribute_flat(node, base, name)
       if var is None or not var.bindings:
         continue
+      # Only create the self and cls variables once we know we need them.
+      variableself = variablecls = None
+      if valself:
+        variableself = valself.AssignToNewVariable(start_node)
+      if valcls:
+        variablecls = valcls.AssignToNewVariable(start_node)
       for varval in var.bindings:
         value = varval.data
         if variableself or variablecls:
@@ -312,6 +323,44 @@ class AbstractAttributeHandler(object):
       break  # we found a class which has this attribute
     return ret
 
+  def _get_mro_start(self, obj, name):
+    """Get the index in obj.mro at which to start looking for an attribute.
+
+    A class that doesn't have a member called name can't provide the attribute,
+    and won't until its members change. So we remember how many leading MRO
+    entries don't have the member, and skip them in later lookups.
+
+    Args:
+      obj: The class whose MRO we're searching.
+      name: The name of the attribute.
+
+    Returns:
+      An index into obj.mro.
+    """
+    key = (obj, name)
+    if key in self._mro_cache:
+      mro, start, classes, changestamps = self._mro_cache[key]
+      if (mro is obj.mro and
+          [cls.members.changestamp for cls in classes] == changestamps):
+        return start
+    classes = []
+    start = 0
+    for base in obj.mro:
+      if isinstance(base, abstract.ParameterizedClass):
+        base = base.base_cls
+      if isinstance(base, abstract.Class):
+        if base.is_lazy:
+          base.load_lazy_attribute(name)
+        if name in base.members or name == "__class__":
+          break
+        classes.append(base)
+      elif isinstance(base, (abstract.Unknown, abstract.Unsolvable)):
+        break
+      start += 1
+    self._mro_cache[key] = (obj.mro, start, classes,
+                            [cls.members.changestamp for cls in classes])
+    return start
+
   def _get_attribute_flat(self, node, obj, name):
     if isinstance(obj, abstract.ParameterizedClass):
       return self._get_attribute_flat(node, obj.base_cls, name)
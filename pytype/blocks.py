@@ -1,9 +1,21 @@
 """Functions for computing the execution order of bytecode."""
 
+import cPickle
+import cStringIO
+import hashlib
+import logging
+import os
+import tempfile
+
 from pytype import utils
 from pytype.pyc import opcodes
 from pytype.pyc import pyc
 
+log = logging.getLogger(__name__)
+
+# Increase this if the serialized format of OrderedCode changes.
+_FORMAT_VERSION = 1
+
 
 class OrderedCode(object):
   """Code object which knows about instruction ordering.
@@ -218,3 +230,172 @@ class OrderCodeVisitor(object):
 
 def process_code(code):
   return pyc.visit(code, OrderCodeVisitor())
+
+
+class _CodeAttributes(object):
+  """Holds the co_* attributes of a deserialized code object."""
+
+  def __init__(self, attributes):
+    self.__dict__.update(attributes)
+
+
+def _all_blocks(order):
+  """Collect the blocks in order, plus the dead blocks that jump into them."""
+  blocks = list(order)
+  seen = set(blocks)
+  for block in blocks:  # grows while we iterate
+    for other in sorted(block.incoming | block.outgoing, key=lambda b: b.id):
+      if other not in seen:
+        seen.add(other)
+        blocks.append(other)
+  return blocks
+
+
+def _serialize_one(code, code_ids):
+  """Flatten a single OrderedCode into tuples of builtin types."""
+  attributes = {name: value for name, value in code.__dict__.items()
+                if name.startswith("co_") and
+                name not in ("co_code", "co_consts")}
+  ops = []
+  block_targets = []
+  for op in code.co_code:
+    if op.has_arg():
+      ops.append((op.name, op.line, op.arg, op.pretty_arg))
+    else:
+      ops.append((op.name, op.line))
+    if getattr(op, "block_target", None):
+      block_targets.append((op.index, op.block_target.index))
+  all_blocks = _all_blocks(code.order)
+  block_index = {block: i for i, block in enumerate(all_blocks)}
+  blocks = tuple((block.code[0].index, block.code[-1].index + 1,
+                  tuple(sorted(block_index[b] for b in block.outgoing)))
+                 for block in all_blocks)
+  # co_consts is a tuple, or a list if pyc.visit replaced nested code objects.
+  consts = (type(code.co_consts),
+            [("code", code_ids[id(c)]) if isinstance(c, OrderedCode)
+             else ("const", c) for c in code.co_consts])
+  return (attributes, consts, code.python_version, ops, block_targets, blocks,
+          len(code.order))
+
+
+def serialize_code(code):
+  """Serialize the result of process_code.
+
+  Nested code objects (in co_consts) are stored in the same flat list, children
+  first, so that deserialize_code never needs to recurse.
+
+  Args:
+    code: An OrderedCode.
+
+  Returns:
+    A string.
+  """
+  entries = []
+  code_ids = {}
+  def add(c):
+    for const in c.co_consts:
+      if isinstance(const, OrderedCode) and id(const) not in code_ids:
+        add(const)
+    code_ids[id(c)] = len(entries)
+    entries.append(_serialize_one(c, code_ids))
+  add(code)
+  def persistent_id(obj):
+    # Ellipsis can't be pickled, but appears in the constants of e.g. "x[...]".
+    return "Ellipsis" if obj is Ellipsis else None
+  f = cStringIO.StringIO()
+  pickler = cPickle.Pickler(f, 2)
+  pickler.persistent_id = persistent_id
+  pickler.dump(entries)
+  return f.getvalue()
+
+
+def _deserialize_one(entry, codes):
+  """Rebuild one OrderedCode. See _serialize_one."""
+  attributes, consts, python_version, ops, block_targets, blocks, n = entry
+  bytecode = []
+  for i, op in enumerate(ops):
+    cls = getattr(opcodes, op[0])
+    bytecode.append(cls(i, *op[1:]))
+  for i, op in enumerate(bytecode):
+    if op.FLAGS & (opcodes.HAS_JREL | opcodes.HAS_JABS):
+      op.target = bytecode[op.arg]
+    op.prev = bytecode[i - 1] if i > 0 else None
+    op.next = bytecode[i + 1] if i < len(bytecode) - 1 else None
+    op.block_target = None
+  for index, target in block_targets:
+    bytecode[index].block_target = bytecode[target]
+  all_blocks = [Block(bytecode[start:end]) for start, end, _ in blocks]
+  for block, (_, _, outgoing) in zip(all_blocks, blocks):
+    for i in outgoing:
+      block.connect_outgoing(all_blocks[i])
+  consts_type, consts = consts
+  co_consts = consts_type(
+      codes[value] if kind == "code" else value for kind, value in consts)
+  attributes = dict(attributes, co_consts=co_consts, co_code=None)
+  return OrderedCode(_CodeAttributes(attributes), bytecode, all_blocks[:n],
+                     python_version)
+
+
+def deserialize_code(data):
+  """Inverse of serialize_code. Doesn't need to disassemble or order blocks."""
+  unpickler = cPickle.Unpickler(cStringIO.StringIO(data))
+  unpickler.persistent_load = lambda _: Ellipsis
+  codes = []
+  for entry in unpickler.load():
+    codes.append(_deserialize_one(entry, codes))
+  return codes[-1]
+
+
+class CodeCache(object):
+  """An on-disk cache of processed code, see VirtualMachine.compile_src.
+
+  Entries are keyed by a hash of the source, the target Python version, the
+  interpreter that compiles it (options.python_exe), the filename and the
+  compile mode, and store the serialized output of process_code.
+  """
+
+  def __init__(self, path):
+    self._path = path
+    if not os.path.isdir(path):
+      try:
+        os.makedirs(path)
+      except OSError:
+        if not os.path.isdir(path):  # not created by a concurrent process
+          raise
+
+  @staticmethod
+  def make_key(src, python_version, python_exe, filename, mode):
+    h = hashlib.sha1()
+    h.update(repr((_FORMAT_VERSION, python_version, python_exe, filename,
+                   mode)))
+    h.update(src.encode("utf-8") if isinstance(src, unicode) else src)
+    return h.hexdigest()
+
+  def _filename(self, key):
+    return os.path.join(self._path, key + ".code")
+
+  def load(self, key):
+    """Retrieve an OrderedCode, or None if there is no (valid) entry."""
+    try:
+      with open(self._filename(key), "rb") as fi:
+        return deserialize_code(fi.read())
+    except IOError:
+      return None
+    except (EOFError, cPickle.UnpicklingError, AttributeError, ValueError,
+            TypeError, IndexError) as e:
+      log.warning("Ignoring corrupted code cache entry %s: %s", key, e)
+      return None
+
+  def store(self, key, code):
+    """Store an OrderedCode, as returned by process_code."""
+    data = serialize_code(code)
+    fd, tmp_filename = tempfile.mkstemp(dir=self._path)
+    try:
+      with os.fdopen(fd, "wb") as fi:
+        fi.write(data)
+      # Renaming is atomic, so concurrent pytype processes never see a
+      # partially written entry.
+      os.rename(tmp_filename, self._filename(key))
+    except:
+      os.remove(tmp_filename)
+      raise
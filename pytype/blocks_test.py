@@ -2,7 +2,9 @@
 
 
 from pytype import blocks
+from pytype import utils
 from pytype.pyc import opcodes
+from pytype.pyc import pyc
 from pytype.tests import test_inference
 import unittest
 
@@ -404,5 +406,91 @@ class BlockStackTest(test_inference.InferenceTest):
     self.assertEquals(bytecode[1], bytecode[10].target)
     self.assertEquals(bytecode[1], bytecode[12].target)
 
+
+class SerializationTest(test_inference.InferenceTest):
+  """Tests for serialize_code, deserialize_code and CodeCache."""
+
+  SRC = """
+def f(x, *args):
+  try:
+    for y in args:
+      if y:
+        break
+      x = x[...]
+  except (KeyError, IndexError):
+    raise
+  finally:
+    x = lambda: (1, 2.0, u"3", 4L, None)
+  return x
+"""
+
+  def _process(self):
+    code = pyc.compile_src(self.SRC, python_version=self.PYTHON_VERSION,
+                           python_exe=self.PYTHON_EXE, filename="foo.py")
+    return blocks.process_code(code)
+
+  def assertCodeEqual(self, expected, actual):
+    self.assertEquals(type(expected.co_consts), type(actual.co_consts))
+    self.assertEquals(len(expected.co_consts), len(actual.co_consts))
+    for const1, const2 in zip(expected.co_consts, actual.co_consts):
+      if isinstance(const1, blocks.OrderedCode):
+        self.assertCodeEqual(const1, const2)
+      else:
+        self.assertEquals(const1, const2)
+    for name in ("co_name", "co_filename", "co_varnames", "co_flags",
+                 "co_firstlineno", "co_argcount", "python_version"):
+      self.assertEquals(getattr(expected, name), getattr(actual, name))
+    self.assertEquals([str(op) for op in expected.co_code],
+                      [str(op) for op in actual.co_code])
+    for op1, op2 in zip(expected.co_code, actual.co_code):
+      self.assertEquals(op1.line, op2.line)
+      self.assertIs(op2.code, actual)
+      for attr in ("target", "block_target", "next", "prev"):
+        target1, target2 = getattr(op1, attr), getattr(op2, attr)
+        self.assertEquals(target1 and target1.index, target2 and target2.index)
+    self.assertEquals([(b.id, len(b.code)) for b in expected.order],
+                      [(b.id, len(b.code)) for b in actual.order])
+    for b1, b2 in zip(expected.order, actual.order):
+      self.assertItemsEqual([b.id for b in b1.incoming],
+                            [b.id for b in b2.incoming])
+      self.assertItemsEqual([b.id for b in b1.outgoing],
+                            [b.id for b in b2.outgoing])
+
+  def test_round_trip(self):
+    code = self._process()
+    self.assertCodeEqual(
+        code, blocks.deserialize_code(blocks.serialize_code(code)))
+
+  def test_cache(self):
+    code = self._process()
+    key = blocks.CodeCache.make_key(self.SRC, self.PYTHON_VERSION, None,
+                                    "foo.py", "exec")
+    with utils.Tempdir() as d:
+      cache = blocks.CodeCache(d.path)
+      self.assertIsNone(cache.load(key))
+      cache.store(key, code)
+      self.assertCodeEqual(code, blocks.CodeCache(d.path).load(key))
+
+  def test_corrupted_cache_entry(self):
+    key = blocks.CodeCache.make_key("", self.PYTHON_VERSION, None, None,
+                                    "exec")
+    with utils.Tempdir() as d:
+      d.create_file(key + ".code", "garbage")
+      self.assertIsNone(blocks.CodeCache(d.path).load(key))
+
+  def test_key(self):
+    make_key = blocks.CodeCache.make_key
+    key = make_key("x = 1", (2, 7), None, "foo.py", "exec")
+    self.assertEquals(key, make_key("x = 1", (2, 7), None, "foo.py", "exec"))
+    self.assertNotEquals(
+        key, make_key("x = 2", (2, 7), None, "foo.py", "exec"))
+    self.assertNotEquals(
+        key, make_key("x = 1", (2, 7), "python2.7", "foo.py", "exec"))
+    self.assertNotEquals(
+        key, make_key("x = 1", (2, 7), None, "bar.py", "exec"))
+    self.assertNotEquals(
+        key, make_key("x = 1", (2, 7), None, "foo.py", "eval"))
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -70,6 +70,14 @@ class Options(object):
               "The default resolves to pytd/builtins/__builtin__.py. "
               "Note that this does not affect the PyTD for builtins, which "
               "is always in pytd/builtins/__builtin__.pytd."))
+    o.add_option(
+        "--call-summaries", action="store_true",
+        dest="call_summaries", default=False,
+        help=("Reuse the result of analyzing a function call for later calls "
+              "whose arguments have the same types, and for calls beyond the "
+              "maximum depth. Faster, but less precise, since e.g. types of "
+              "nested attributes aren't compared. Calls that change their "
+              "arguments or globals aren't reused."))
     o.add_option(
         "-C", "--check", action="store_true",
         dest="check",
@@ -85,12 +93,33 @@ class Options(object):
     o.add_option(
         "--generate-builtins", action="store",
         dest="generate_builtins", default=None,
-        help="Precompile builtins pytd and write to the given file.")
+        help=("Precompile builtins pytd and the stdlib and write them to the "
+              "given file."))
     o.add_option(
         "--imports_info", type="string", action="store",
         dest="imports_info", default=None,
         help=("Information for mapping import .pytd to files. "
               "This options is incompatible with --pythonpath."))
+    o.add_option(
+        "--incremental", action="store_true",
+        dest="incremental", default=False,
+        help=("Store a record of what every generated .pyi depends on next to "
+              "it, and skip files whose source, options and imported modules "
+              "haven't changed since, reporting the recorded errors instead. "
+              "Has no effect when only checking a file. Works best together "
+              "with --pyi-cache-dir."))
+    o.add_option(
+        "-j", "--jobs", type="int", action="store",
+        dest="jobs", default=1,
+        help=("Number of worker processes to use when processing more than "
+              "one file. Files are scheduled in the order given by the "
+              "dependency graph derived from --imports_info."))
+    o.add_option(
+        "--lazy-pyi", action="store_true",
+        dest="lazy_pyi", default=False,
+        help=("Resolve the classes and functions of imported .pyi files the "
+              "first time they're used, instead of resolving (and importing "
+              "the dependencies of) whole files on import."))
     o.add_option(
         "-m", "--main", action="store_true",
         dest="main_only", default=False,
@@ -147,7 +176,18 @@ class Options(object):
     o.add_option(
         "--precompiled-builtins", action="store",
         dest="precompiled_builtins", default=None,
-        help="Use the supplied file as precompiled builtins pytd.")
+        help=("Use the supplied file as precompiled builtins pytd and "
+              "stdlib."))
+    o.add_option(
+        "--code-cache-dir", type="string", action="store",
+        dest="code_cache_dir", default=None,
+        help=("Directory for caching compiled and block-ordered byte code "
+              "across runs. Created if it doesn't exist."))
+    o.add_option(
+        "--pyi-cache-dir", type="string", action="store",
+        dest="pyi_cache_dir", default=None,
+        help=("Directory for caching resolved pyi files of dependencies "
+              "across runs. Created if it doesn't exist."))
     o.add_option(
         "--python_exe", type="string", action="store",
         dest="python_exe", default=None,
@@ -155,6 +195,14 @@ class Options(object):
               "source(s) to byte code. Can be \"HOST\" to use the same Python "
               "that is running pytype. If not specified, --python_version is "
               "used to create the name of an interpreter."))
+    o.add_option(
+        "--server", action="store_true",
+        dest="server", default=False,
+        help=("Run as a server that keeps the builtins and the stdlib loaded "
+              "between requests. Reads one request per line from stdin, as a "
+              "JSON object {\"args\": [pytype arguments for one file], "
+              "\"src\": optional source of the file}, and writes one JSON "
+              "response per line to stdout."))
     o.add_option(
         "--touch", type="string", action="store",
         dest="touch", default=None,
@@ -280,6 +328,11 @@ class Options(object):
           "Python versions 3.0 - 3.3 are not supported. "
           "Use 3.4 and higher.")
 
+  def _store_jobs(self, jobs):
+    if jobs < 1:
+      raise optparse.OptionValueError("--jobs must be at least 1: %r" % jobs)
+    self.jobs = jobs
+
   def _store_disable(self, disable):
     if disable:
       self.disable = disable.split(",")
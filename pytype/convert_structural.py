@@ -1,5 +1,6 @@
 """Solver for type equations."""
 
+import collections
 import logging
 
 from pytype.pytd import booleq
@@ -26,6 +27,71 @@ class FlawedQuery(Exception):
   pass
 
 
+class _MethodIndex(object):
+  """Index from method names to the complete classes that might have them.
+
+  A class might have a method if it or one of its base classes defines it.
+  Classes with a base class we can't look into (e.g. a union) might have any
+  method. Since match_Function_against_Class can only succeed for methods a
+  class might have, matching an ~unknown against any class not returned by
+  get_candidates() yields booleq.FALSE.
+  """
+
+  def __init__(self, classes):
+    self._all = set()
+    self._wildcards = set()
+    self._classes_by_method = collections.defaultdict(set)
+    cache = {}
+    for cls in classes:
+      self._all.add(id(cls))
+      names = self._get_method_names(cls, cache)
+      if names is None:
+        self._wildcards.add(id(cls))
+      else:
+        for name in names:
+          self._classes_by_method[name].add(id(cls))
+
+  def _get_method_names(self, cls, cache):
+    """Get the names of all methods of cls and its bases, or None for "any"."""
+    key = id(cls)
+    if key not in cache:
+      cache[key] = frozenset()  # guard against cyclic class hierarchies
+      names = {f.name for f in cls.methods}
+      for base in cls.parents:
+        if isinstance(base, pytd.AnythingType):
+          # match_Function_against_Class doesn't find methods in "?" bases.
+          continue
+        elif isinstance(base, pytd.ClassType):
+          base_names = self._get_method_names(base.cls, cache)
+        elif isinstance(base, pytd.GenericType):
+          base_names = self._get_method_names(base.base_type.cls, cache)
+        else:
+          base_names = None
+        if base_names is None:
+          names = None
+          break
+        names |= base_names
+      cache[key] = None if names is None else frozenset(names)
+    return cache[key]
+
+  def get_candidates(self, unknown):
+    """Get the ids of the classes that unknown could possibly match."""
+    names = {f.name for f in unknown.methods}
+    if not names:
+      return self._all
+    candidates = set.intersection(*(self._classes_by_method.get(name, set())
+                                    for name in names))
+    return candidates | self._wildcards
+
+
+def _group_by_name(nodes, get_name=lambda name: name):
+  """Group pytd nodes (classes or functions) by get_name(node.name)."""
+  nodes_by_name = collections.defaultdict(list)
+  for node in nodes:
+    nodes_by_name[get_name(node.name)].append(node)
+  return nodes_by_name
+
+
 class TypeSolver(object):
   """Class for solving ~unknowns in type inference results."""
 
@@ -130,13 +196,23 @@ class TypeSolver(object):
       else:
         complete_classes.add(cls)
 
-    for complete in complete_classes.union(self.builtins.classes):
+    complete_classes = complete_classes.union(self.builtins.classes)
+    method_index = _MethodIndex(complete_classes)
+    candidates = {unknown: method_index.get_candidates(unknown)
+                  for unknown in unknown_classes}
+    partials_by_name = _group_by_name(
+        partial_classes, type_match.unpack_name_of_partial)
+    for complete in complete_classes:
       for unknown in unknown_classes:
-        self.match_unknown_against_complete(factory, solver, unknown, complete)
-      for partial in partial_classes:
-        if type_match.unpack_name_of_partial(partial.name) == complete.name:
-          self.match_partial_against_complete(
-              factory, solver, partial, complete)
+        if id(complete) in candidates[unknown]:
+          self.match_unknown_against_complete(
+              factory, solver, unknown, complete)
+        else:
+          # Record the mismatch anyway. The solver treats a value without any
+          # implication as unconstrained, not as impossible.
+          solver.implies(booleq.Eq(unknown.name, complete.name), booleq.FALSE)
+      for partial in partials_by_name.get(complete.name, ()):
+        self.match_partial_against_complete(factory, solver, partial, complete)
 
     partial_functions = set()
     complete_functions = set()
@@ -145,10 +221,12 @@ class TypeSolver(object):
         partial_functions.add(f)
       else:
         complete_functions.add(f)
+    complete_by_name = _group_by_name(
+        complete_functions.union(self.builtins.functions))
     for partial in partial_functions:
-      for complete in complete_functions.union(self.builtins.functions):
-        if type_match.unpack_name_of_partial(partial.name) == complete.name:
-          self.match_call_record(factory, solver, partial, complete)
+      name = type_match.unpack_name_of_partial(partial.name)
+      for complete in complete_by_name.get(name, ()):
+        self.match_call_record(factory, solver, partial, complete)
 
     log.info("=========== Equations to solve =============\n%s", solver)
     log.info("=========== Equations to solve (end) =======")
@@ -669,5 +669,18 @@ class MatchTest(unittest.TestCase):
     """)
     self.assertItemsEqual(["Foo", "Base1"], mapping["~unknown1"])
 
+  def test_no_class_has_method(self):
+    mapping = self.parse_and_solve("""
+      class Foo():
+        def f(self) -> int
+      class `~unknown1`():
+        def f(self) -> int
+        def method_that_no_class_has(self) -> ?
+      class `~unknown2`():
+        pass
+    """)
+    self.assertItemsEqual([], mapping["~unknown1"])
+    self.assertIn("Foo", mapping["~unknown2"])
+
 if __name__ == "__main__":
   test_inference.main()
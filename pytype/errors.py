@@ -176,6 +176,11 @@ class ErrorLogBase(object):
     if self._filter is None or self._filter(error):
       self._errors.append(error)
 
+  def extend(self, errors):
+    """Add errors collected elsewhere, e.g. by a worker process."""
+    for error in errors:
+      self._add(error)
+
   def warn(self, opcode, message, *args):
     self._add(Error.at_opcode(opcode, SEVERITY_WARNING, message % args))
 
@@ -0,0 +1,155 @@
+"""Reuse the results of previous pytype runs for files that haven't changed.
+
+With --incremental, every .pyi we generate gets a record file next to it. The
+record contains fingerprints of everything the analysis depended on (the
+source file, the options, pytype itself, and every module that was imported,
+or that we tried to import), as well as the errors that were found. If all the
+fingerprints still match on the next run, the .pyi is left alone and the
+recorded errors are reported again.
+"""
+
+import cPickle
+import hashlib
+import logging
+import os
+import tempfile
+
+from pytype import load_pytd
+from pytype import metrics
+
+
+log = logging.getLogger(__name__)
+
+
+_skip_metric = metrics.MapCounter("incremental")
+
+# Increase this if the format of records changes.
+_VERSION = 1
+
+# The options that don't influence the generated .pyi or the errors. All other
+# options are part of the key, so new options are taken into account unless
+# they're added here.
+_IGNORED_OPTIONS = frozenset([
+    "code_cache_dir",
+    "generate_builtins",
+    "imports_info",  # imports_map is part of the key
+    "incremental",
+    "jobs",
+    "metrics",
+    "output",
+    "output_cfg",
+    "output_debug",
+    "output_errors_csv",
+    "output_typegraph",
+    "profile",
+    "pyi_cache_dir",
+    "server",
+    "src_out",  # the source file is part of the key
+    "touch",
+])
+
+# Fingerprint of pytype's own source code, computed by _get_pytype_key().
+_pytype_key = None
+
+
+def _get_pytype_key():
+  """Compute a hash of pytype's own sources, so new versions redo analysis."""
+  global _pytype_key
+  if _pytype_key is None:
+    h = hashlib.sha1()
+    pytype_dir = os.path.dirname(os.path.abspath(__file__))
+    for path, dirs, files in os.walk(pytype_dir):
+      dirs.sort()
+      for filename in sorted(files):
+        if filename.endswith((".py", ".pytd")):
+          with open(os.path.join(path, filename), "rb") as fi:
+            h.update(filename)
+            h.update(fi.read())
+    _pytype_key = h.hexdigest()
+  return _pytype_key
+
+
+def _hash_file(filename):
+  with open(filename, "rb") as fi:
+    return hashlib.sha1(fi.read()).hexdigest()
+
+
+def _get_analysis_options(options):
+  """Return the (name, value) pairs of the options that can affect analysis."""
+  return sorted((name, value) for name, value in vars(options).items()
+                if not name.startswith("_") and name not in _IGNORED_OPTIONS)
+
+
+def _make_key(input_filename, options):
+  """Compute a hash of the source file, the options and pytype."""
+  h = hashlib.sha1()
+  h.update(repr((_VERSION, _get_pytype_key())))
+  h.update(repr(_get_analysis_options(options)))
+  h.update(_hash_file(input_filename))
+  return h.hexdigest()
+
+
+def get_record_filename(output_filename):
+  return output_filename + ".incremental"
+
+
+def load(input_filename, output_filename, options):
+  """Look up the result of a previous run.
+
+  Args:
+    input_filename: The name of the .py file.
+    output_filename: The name of the .pyi file the previous run wrote.
+    options: config.Options object.
+
+  Returns:
+    The list of errors found in the previous run, or None if we need to
+    analyze the file again.
+  """
+  try:
+    with open(get_record_filename(output_filename), "rb") as fi:
+      version, key, output_key, module_keys, errors = cPickle.load(fi)
+  except (IOError, EOFError, ValueError, cPickle.UnpicklingError) as e:
+    log.info("No incremental record for %s: %s", input_filename, e)
+    _skip_metric.inc("miss")
+    return None
+  if (version != _VERSION or not os.path.exists(output_filename) or
+      key != _make_key(input_filename, options) or
+      output_key != _hash_file(output_filename) or
+      not load_pytd.Loader(None, options).verify_module_keys(module_keys)):
+    log.info("Incremental record for %s is outdated", input_filename)
+    _skip_metric.inc("miss")
+    return None
+  _skip_metric.inc("hit")
+  return errors
+
+
+def store(input_filename, output_filename, options, loader, errorlog):
+  """Record the result of a run, for load().
+
+  Needs to be called after the .pyi has been written.
+
+  Args:
+    input_filename: The name of the .py file.
+    output_filename: The name of the .pyi file that was written.
+    options: config.Options object.
+    loader: The load_pytd.Loader that was used for the analysis.
+    errorlog: The errors.ErrorLog with the errors that were found.
+  """
+  record_filename = get_record_filename(output_filename)
+  module_keys = loader.get_module_keys()
+  if module_keys is None:
+    log.info("Can't create an incremental record for %s", input_filename)
+    if os.path.exists(record_filename):
+      os.remove(record_filename)
+    return
+  record = (_VERSION, _make_key(input_filename, options),
+            _hash_file(output_filename), module_keys, list(errorlog))
+  fd, tmp_filename = tempfile.mkstemp(
+      dir=os.path.dirname(os.path.abspath(record_filename)))
+  try:
+    with os.fdopen(fd, "wb") as fi:
+      cPickle.dump(record, fi, 2)
+    os.rename(tmp_filename, record_filename)
+  except:
+    os.remove(tmp_filename)
+    raise
@@ -0,0 +1,98 @@
+"""Tests for incremental.py."""
+
+from pytype import config
+from pytype import errors
+from pytype import incremental
+from pytype import load_pytd
+from pytype import utils
+
+import unittest
+
+
+class IncrementalTest(unittest.TestCase):
+  """Tests for incremental.load and incremental.store."""
+
+  def setUp(self):
+    self.options = config.Options.create(python_version=(2, 7))
+
+  def _store(self, d):
+    loader = load_pytd.Loader("main", self.options)
+    loader.import_name("dep")
+    loader.import_name("missing")
+    errorlog = errors.ErrorLog()
+    errorlog.pyi_error(None, "foo", "some error")
+    incremental.store(d["main.py"], d["main.pyi"], self.options, loader,
+                      errorlog)
+
+  def _load(self, d):
+    return incremental.load(d["main.py"], d["main.pyi"], self.options)
+
+  def _setup_files(self, d):
+    d.create_file("main.py", "import dep")
+    d.create_file("main.pyi", "")
+    d.create_file("dep.pyi", "x = ...  # type: int")
+    self.options.tweak(pythonpath=[d.path])
+
+  def testUnchanged(self):
+    with utils.Tempdir() as d:
+      self._setup_files(d)
+      self.assertIsNone(self._load(d))
+      self._store(d)
+      error, = self._load(d)
+      self.assertEquals("pyi-error", error.name)
+
+  def testChangedSource(self):
+    with utils.Tempdir() as d:
+      self._setup_files(d)
+      self._store(d)
+      d.create_file("main.py", "import dep\nimport missing")
+      self.assertIsNone(self._load(d))
+
+  def testChangedOptions(self):
+    with utils.Tempdir() as d:
+      self._setup_files(d)
+      self._store(d)
+      self.options.tweak(quick=True)
+      self.assertIsNone(self._load(d))
+
+  def testClassifiedOptions(self):
+    # If this fails, decide whether the new option can change the analysis
+    # results. If it can't, add it to incremental._IGNORED_OPTIONS, otherwise
+    # add it here.
+    analysis_options = {
+        "abort_on_complex", "cache_unknowns", "call_summaries", "check",
+        "check_preconditions", "disable", "imports_map", "lazy_pyi",
+        "main_only", "module_name", "nofail", "precompiled_builtins",
+        "pybuiltins_filename", "python_exe", "python_version", "pythonpath",
+        "quick", "report_errors", "run_builtins", "skip_repeat_calls",
+        "typeshed",
+    }
+    names = {name for name, _ in incremental._get_analysis_options(
+        self.options)}
+    self.assertSetEqual(analysis_options, names)
+    self.assertLessEqual(incremental._IGNORED_OPTIONS, set(vars(self.options)))
+
+  def testChangedDependency(self):
+    with utils.Tempdir() as d:
+      self._setup_files(d)
+      self._store(d)
+      d.create_file("dep.pyi", "x = ...  # type: str")
+      self.assertIsNone(self._load(d))
+
+  def testNewDependency(self):
+    with utils.Tempdir() as d:
+      self._setup_files(d)
+      self._store(d)
+      d.create_file("missing.pyi", "")
+      self.assertIsNone(self._load(d))
+
+  def testChangedOutput(self):
+    with utils.Tempdir() as d:
+      self._setup_files(d)
+      self._store(d)
+      d.create_file("main.pyi", "x = ...  # type: int")
+      self.assertIsNone(self._load(d))
+
+
+if __name__ == "__main__":
+  unittest.main()
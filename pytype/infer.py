@@ -630,7 +630,7 @@ def program_to_dot(program, ignored, only_cfg=False):
   return sb.getvalue()
 
 
-def _get_module_name(filename, options):
+def get_module_name(filename, options):
   """Return, or try to reverse-engineer, the name of the module we're analyzing.
 
   If a module was passed using --module-name, that name will be returned.
@@ -664,13 +664,15 @@ def check_types(py_src, pytd_src, py_filename, pytd_filename, errorlog,
                 run_builtins=True,
                 deep=True,
                 cache_unknowns=False,
-                init_maximum_depth=INIT_MAXIMUM_DEPTH):
+                init_maximum_depth=INIT_MAXIMUM_DEPTH,
+                loader=None):
   """Verify a PyTD against the Python code."""
   tracer = CallTracer(errorlog=errorlog, options=options,
-                      module_name=_get_module_name(py_filename, options),
+                      module_name=get_module_name(py_filename, options),
                       cache_unknowns=cache_unknowns,
                       analyze_annotated=True,
-                      generate_unknowns=False)
+                      generate_unknowns=False,
+                      loader=loader)
   loc, defs = tracer.run_program(
       py_src, py_filename, init_maximum_depth, run_builtins)
   if pytd_src is not None:
@@ -692,7 +694,8 @@ def infer_types(src,
                 deep=True, solve_unknowns=True,
                 cache_unknowns=False, show_library_calls=False,
                 analyze_annotated=False,
-                init_maximum_depth=INIT_MAXIMUM_DEPTH, maximum_depth=None):
+                init_maximum_depth=INIT_MAXIMUM_DEPTH, maximum_depth=None,
+                loader=None):
   """Given Python source return its types.
 
   Args:
@@ -711,17 +714,19 @@ def infer_types(src,
     analyze_annotated: If True, analyze methods with type annotations, too.
     init_maximum_depth: Depth of analysis during module loading.
     maximum_depth: Depth of the analysis. Default: unlimited.
+    loader: The load_pytd.Loader to use for imports. Default: a new one.
   Returns:
     A TypeDeclUnit
   Raises:
     AssertionError: In case of a bad parameter combination.
   """
   tracer = CallTracer(errorlog=errorlog, options=options,
-                      module_name=_get_module_name(filename, options),
+                      module_name=get_module_name(filename, options),
                       cache_unknowns=cache_unknowns,
                       analyze_annotated=analyze_annotated,
                       generate_unknowns=not options.quick,
-                      store_all_calls=not deep)
+                      store_all_calls=not deep,
+                      loader=loader)
   loc, defs = tracer.run_program(
       src, filename, init_maximum_depth, run_builtins)
   log.info("===Done running definitions and module-level code===")
@@ -1,9 +1,18 @@
 """Load and link .pyi files."""
 
+import cPickle
+import cStringIO
+import hashlib
 import logging
 import os
+import sys
+import tempfile
 
 
+from pytype import metrics
+from pytype import utils
+from pytype.pyi import parser
+from pytype.pytd import pytd
 from pytype.pytd import typeshed
 from pytype.pytd import utils as pytd_utils
 from pytype.pytd.parse import builtins
@@ -11,6 +20,57 @@ from pytype.pytd.parse import visitors
 
 log = logging.getLogger(__name__)
 
+_cache_metric = metrics.MapCounter("load_pytd_cache")
+
+# PrecompiledModules, set by LoadPrecompiled().
+_precompiled_modules = None
+
+# Increase this if the pickled format of modules changes.
+_FORMAT_VERSION = 1
+
+
+def _make_key(module_name, python_version, src):
+  """Compute Module.key for a module with the given source."""
+  h = hashlib.sha1()
+  h.update(repr((_FORMAT_VERSION, module_name, python_version)))
+  h.update(src)
+  return h.hexdigest()
+
+
+def _dump_module(data, ast, f):
+  """Pickle data containing a resolved AST, without its external pointers.
+
+  Pointers to classes in other modules (ClassType.cls) are stored as None, and
+  need to be filled in again (using FillInModuleClasses) after loading.
+
+  Args:
+    data: The data to pickle. Typically a tuple containing ast.
+    ast: A resolved module, instance of pytd.TypeDeclUnit.
+    f: A file object, opened for writing in binary mode.
+  """
+  own_classes = {id(cls) for cls in ast.classes}
+  def persistent_id(obj):
+    if isinstance(obj, pytd.Class) and id(obj) not in own_classes:
+      return "external"
+    return None
+  # Pickling an AST tends to bump up against the recursion limit, see
+  # builtins.Precompile.
+  old_limit = sys.getrecursionlimit()
+  sys.setrecursionlimit(20000)
+  try:
+    pickler = cPickle.Pickler(f, 2)
+    pickler.persistent_id = persistent_id
+    pickler.dump(data)
+  finally:
+    sys.setrecursionlimit(old_limit)
+
+
+def _load_module(f):
+  """Load data written by _dump_module."""
+  unpickler = cPickle.Unpickler(f)
+  unpickler.persistent_load = lambda _: None  # external class pointers
+  return unpickler.load()
+
 
 class Module(object):
   """Represents a parsed module.
@@ -21,13 +81,137 @@ class Module(object):
       unique.
     ast: The parsed PyTD. Internal references will be resolved, but
       NamedType nodes referencing other modules might still be unresolved.
+    key: A hash of the module's source, for ModuleCache. None if the module
+      didn't come from a file (and hence can't be cached).
+    dependencies: The names of the modules this module references.
+    resolver: A _LazyResolver, if the module was loaded with options.lazy_pyi
+      and hasn't been resolved completely yet. In that case, ast is the
+      unresolved module. None otherwise.
   """
 
-  def __init__(self, module_name, filename, ast):
+  def __init__(self, module_name, filename, ast, key=None, dependencies=()):
     self.module_name = module_name
     self.filename = filename
     self.ast = ast
+    self.key = key
+    self.dependencies = dependencies
     self.dirty = True
+    self.resolver = None
+
+  def symbols(self):
+    """Returns the symbol table (an object with a Lookup method) to use."""
+    return self.resolver or self.ast
+
+
+class _LazyResolver(object):
+  """Resolves the members of a module the first time they're looked up.
+
+  See options.lazy_pyi. Every member goes through the steps Loader._load_file
+  applies to a whole module, but only the modules the member references are
+  imported. Resolved members are stored before ClassType pointers in them are
+  filled in, so members that reference each other don't recurse endlessly.
+  """
+
+  def __init__(self, loader, module):
+    self._loader = loader
+    self._module = module
+    # The module holds on to its unresolved members, so their ids stay valid.
+    self._members = {id(m) for m in _members(module.ast)}
+    self._resolved = {}  # id of an unresolved member -> resolved member
+    self._in_progress = set()
+    # AdjustTypeParameters collects the type parameters the module uses, for
+    # adding missing definitions in resolve_all().
+    self._adjuster = visitors.AdjustTypeParameters()
+    self.references = _ReferenceLookup(module.ast, self)
+
+  def __contains__(self, member):
+    """Whether member is an (unresolved) member of our module."""
+    return id(member) in self._members
+
+  def Lookup(self, name):
+    return self.resolve(self._module.ast.Lookup(name))
+
+  def resolve(self, member):
+    """Resolve a member of the unresolved module.
+
+    Args:
+      member: A constant, type parameter, class, function or alias of
+        Module.ast.
+    Returns:
+      The resolved member.
+    Raises:
+      BadDependencyError: If the member references something we can't find.
+    """
+    key = id(member)
+    resolved = self._resolved.get(key)
+    if resolved is not None:
+      return resolved
+    if key in self._in_progress:
+      raise BadDependencyError("Cyclic reference to %s" % member.name,
+                               self._module.module_name)
+    self._in_progress.add(key)
+    try:
+      resolved = self._loader._resolve_member(  # pylint: disable=protected-access
+          self._module, member, self._adjuster)
+    finally:
+      self._in_progress.remove(key)
+    self._resolved[key] = resolved
+    try:
+      self._loader._finish_member(self._module, resolved)  # pylint: disable=protected-access
+    except:
+      del self._resolved[key]
+      raise
+    return resolved
+
+  def resolve_all(self):
+    """Resolve all members and return the resolved module.
+
+    Members that can't be resolved are left out. Code using them gets an error
+    when the member is resolved for it (see Loader.resolve_member).
+
+    Returns:
+      The resolved module, an instance of pytd.TypeDeclUnit.
+    """
+    ast = self._module.ast
+    def resolve(members):
+      resolved = []
+      for member in members:
+        try:
+          resolved.append(self.resolve(member))
+        except (parser.ParseError, BadDependencyError,
+                visitors.ContainerError, visitors.SymbolLookupError) as e:
+          log.warning("Leaving out %s: %s", member.name, e)
+      return tuple(resolved)
+    ast = ast.Replace(constants=resolve(ast.constants),
+                      type_params=resolve(ast.type_params),
+                      classes=resolve(ast.classes),
+                      functions=resolve(ast.functions),
+                      aliases=resolve(ast.aliases))
+    return self._adjuster.VisitTypeDeclUnit(ast)
+
+
+class _ReferenceLookup(object):
+  """Symbol table for looking up a lazily resolved module from elsewhere.
+
+  Classes are returned unresolved, since LookupExternalTypes only needs their
+  names (ClassType pointers are filled in by FillInModuleClasses later). Other
+  members are copied into the referencing module, so they're resolved.
+  """
+
+  def __init__(self, ast, resolver):
+    self._ast = ast
+    self._resolver = resolver
+
+  def Lookup(self, name):
+    item = self._ast.Lookup(name)
+    if isinstance(item, pytd.Class):
+      return item
+    return self._resolver.resolve(item)
+
+
+def _members(ast):
+  return (ast.constants + ast.type_params + ast.classes + ast.functions +
+          ast.aliases)
 
 
 class BadDependencyError(Exception):
@@ -41,6 +225,184 @@ class BadDependencyError(Exception):
     return self.message
 
 
+class ModuleCache(object):
+  """An on-disk cache of resolved modules.
+
+  Entries are keyed by Module.key, and store the resolved AST together with
+  the keys of all the modules it (transitively) depends on. Pointers to
+  classes in other modules are not stored, and need to be filled in again
+  after loading.
+  """
+
+  def __init__(self, path):
+    self._path = path
+    if not os.path.isdir(path):
+      try:
+        os.makedirs(path)
+      except OSError:
+        if not os.path.isdir(path):  # not created by a concurrent process
+          raise
+
+  def _filename(self, key):
+    return os.path.join(self._path, key + ".pickle")
+
+  def load(self, key):
+    """Retrieve a cache entry.
+
+    Args:
+      key: The Module.key of the module.
+
+    Returns:
+      A tuple (ast, dependencies, dependency_keys), or None if there is no
+      entry. dependency_keys maps the name of every module the AST
+      transitively depends on to its Module.key.
+    """
+    try:
+      with open(self._filename(key), "rb") as fi:
+        return _load_module(fi)
+    except (IOError, EOFError, cPickle.UnpicklingError) as e:
+      if not isinstance(e, IOError):
+        log.warning("Ignoring corrupted cache entry %s: %s", key, e)
+      return None
+
+  def store(self, key, ast, dependencies, dependency_keys):
+    """Store a resolved AST. See load()."""
+    fd, tmp_filename = tempfile.mkstemp(dir=self._path)
+    try:
+      with os.fdopen(fd, "wb") as fi:
+        _dump_module((ast, dependencies, dependency_keys), ast, fi)
+      # Renaming is atomic, so concurrent pytype processes never see a
+      # partially written entry.
+      os.rename(tmp_filename, self._filename(key))
+    except:
+      os.remove(tmp_filename)
+      raise
+
+
+class PrecompiledModules(object):
+  """Resolved stdlib modules, stored in the file written by Precompile().
+
+  Every module is pickled separately, so that the Loader only needs to unpickle
+  the modules that are actually imported.
+  """
+
+  def __init__(self, python_version, use_typeshed):
+    self.format_version = _FORMAT_VERSION
+    self.python_version = python_version
+    self.use_typeshed = use_typeshed
+    self._entries = {}  # module name -> (subdir, key, pickled data)
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, module_name):
+    return module_name in self._entries
+
+  def matches(self, options):
+    """Whether these modules can be used for the given config.Options."""
+    return (self.format_version == _FORMAT_VERSION and
+            self.python_version == options.python_version and
+            self.use_typeshed == options.typeshed)
+
+  def add(self, subdir, module):
+    """Add a resolved module.
+
+    Args:
+      subdir: The directory the module was found in, "builtins" or "stdlib".
+        See Loader._import_name for how these take precedence.
+      module: A Module.
+    """
+    f = cStringIO.StringIO()
+    _dump_module((module.ast, module.dependencies), module.ast, f)
+    self._entries[module.module_name] = (subdir, module.key, f.getvalue())
+
+  def get(self, subdir, module_name):
+    """Unpickle a module.
+
+    Args:
+      subdir: The directory we're looking in, "builtins" or "stdlib".
+      module_name: The name of the module.
+    Returns:
+      A tuple (ast, dependencies, key), or None if we don't have the module.
+    """
+    entry = self._entries.get(module_name)
+    if entry is None or entry[0] != subdir:
+      return None
+    _, key, data = entry
+    ast, dependencies = _load_module(cStringIO.StringIO(data))
+    return ast, dependencies, key
+
+
+def Precompile(f, options):
+  """Write precompiled builtins and stdlib modules to the specified file.
+
+  Every module in pytd/builtins, pytd/stdlib and (unless options.typeshed is
+  False) typeshed's stdlib is loaded and resolved, for options.python_version.
+
+  Args:
+    f: A file object, opened for writing in binary mode.
+    options: config.Options object.
+  """
+  loader = Loader(None, options)
+  pytd_dir = os.path.dirname(pytd_utils.__file__)
+  names = set()
+  for subdir in ("builtins", "stdlib"):
+    names |= utils.find_module_names(os.path.join(pytd_dir, subdir), ".pytd")
+  if options.typeshed:
+    names |= typeshed.get_all_module_names("stdlib", options.python_version)
+  for name in sorted(names):
+    try:
+      loader.import_name(name)
+    except Exception as e:  # pylint: disable=broad-except
+      log.warning("Not precompiling %s: %s", name, e)
+  modules = PrecompiledModules(options.python_version, options.typeshed)
+  _add_builtin_modules(loader, modules)
+  log.info("Precompiled %d modules", len(modules))
+  builtins.Precompile(f, modules)
+
+
+def LoadPrecompiled(f):
+  """Load precompiled builtins and stdlib modules, written by Precompile()."""
+  global _precompiled_modules
+  _precompiled_modules = builtins.LoadPrecompiled(f)
+
+
+def RetainModules(loader):
+  """Keep the builtins and stdlib modules of a Loader for later Loaders.
+
+  For long-running processes (see --server). The modules are added to the
+  precompiled modules, so Loaders created later, for the same Python version,
+  don't need to parse and resolve them again.
+
+  Args:
+    loader: A Loader that is done importing.
+  """
+  global _precompiled_modules
+  options = loader.options
+  if not (_precompiled_modules and _precompiled_modules.matches(options)):
+    _precompiled_modules = PrecompiledModules(options.python_version,
+                                              options.typeshed)
+  _add_builtin_modules(loader, _precompiled_modules)
+
+
+def _add_builtin_modules(loader, modules):
+  """Add the builtins and stdlib modules of a Loader to PrecompiledModules."""
+  # pylint: disable=protected-access
+  for name, module in sorted(loader._modules.items()):
+    if (name in ("__builtin__", "typing") or name in modules or
+        module.filename != Loader.PREFIX + name or module.resolver):
+      continue
+    # Modules resolved against a module from the pythonpath can't be reused.
+    if not all(dep in loader._modules and
+               loader._modules[dep].filename == Loader.PREFIX + dep
+               for dep in module.dependencies):
+      continue
+    for subdir in ("builtins", "stdlib"):
+      if loader._find_builtin(subdir, name):
+        modules.add(subdir, module)
+        break
+
+
 class Loader(object):
   """A cache for loaded PyTD files.
 
@@ -53,6 +415,12 @@ class Loader(object):
     _modules: A map, filename to Module, for caching modules already loaded.
     _concatenated: A concatenated pytd of all the modules. Refreshed when
                    necessary.
+    _cache: A ModuleCache, if options.pyi_cache_dir is set. Otherwise None.
+    _precompiled: PrecompiledModules from LoadPrecompiled(), if they match our
+      options. Otherwise None.
+    _missing_modules: Names of modules we tried to import, but didn't find.
+    _resolvers: A map, module name to the _LazyResolver of modules loaded with
+      options.lazy_pyi.
   """
 
   PREFIX = "pytd:"  # for pytd files that ship with pytype
@@ -70,6 +438,20 @@ class Loader(object):
         Module("typing", self.PREFIX + "typing", self.typing)
     }
     self._concatenated = None
+    self._missing_modules = set()
+    self._resolvers = {}
+    if self.options.pyi_cache_dir:
+      self._cache = ModuleCache(self.options.pyi_cache_dir)
+    else:
+      self._cache = None
+    if _precompiled_modules and _precompiled_modules.matches(options):
+      self._precompiled = _precompiled_modules
+    else:
+      self._precompiled = None
+    for module in self._modules.values():
+      module.key = _make_key(
+          module.module_name, self.options.python_version,
+          pytd_utils.GetPredefinedFile("builtins", module.module_name))
     # Paranoid verification that pytype.main properly checked the flags:
     if self.options.imports_map is not None:
       assert self.options.pythonpath == [""]
@@ -82,11 +464,28 @@ class Loader(object):
     return ast
 
   def _create_empty(self, module_name, filename):
-    return self._load_file(module_name, filename,
-                           pytd_utils.EmptyModule(module_name))
+    ast = self._load_file(module_name, filename,
+                          pytd_utils.EmptyModule(module_name))
+    module = self._modules[module_name]
+    if module.key is None:
+      module.key = _make_key(module_name, self.options.python_version, "")
+    return ast
+
+  def _load_file(self, module_name, filename, ast=None, src=None,
+                 src_filename=None):
+    """Load (or retrieve from cache) a module and resolve its dependencies.
 
-  def _load_file(self, module_name, filename, ast=None):
-    """Load (or retrieve from cache) a module and resolve its dependencies."""
+    Args:
+      module_name: The name of the module. May contain dots.
+      filename: The (unique) filename of the module. Also the file we read the
+        module from, if neither ast nor src are given.
+      ast: The already parsed module, if available.
+      src: The source of the module, if available.
+      src_filename: The filename to report in parser errors, if different
+        from filename.
+    Returns:
+      The resolved module, an instance of pytd.TypeDeclUnit.
+    """
     self._concatenated = None  # invalidate
     existing = self._modules.get(module_name)
     if existing:
@@ -94,16 +493,34 @@ class Loader(object):
         raise AssertionError("%s exists as both %s and %s" %
                              (module_name, filename, existing.filename))
       return existing.ast
+    key = None
     if not ast:
-      ast = builtins.ParsePyTD(filename=filename,
+      if src is None:
+        with open(filename, "rb") as fi:
+          src = fi.read()
+      key = _make_key(module_name, self.options.python_version, src)
+      if self._cache:
+        cached_ast = self._load_from_cache(module_name, filename, key)
+        if cached_ast:
+          return cached_ast
+      ast = builtins.ParsePyTD(src=src,
+                               filename=src_filename or filename,
                                module=module_name,
                                python_version=self.options.python_version)
     ast = self._postprocess_pyi(ast)
-    module = Module(module_name, filename, ast)
+    module = Module(module_name, filename, ast, key)
     self._modules[module_name] = module
+    if self.options.lazy_pyi:
+      deps = visitors.CollectDependencies()
+      ast.Visit(deps)
+      module.dependencies = tuple(sorted(deps.modules))
+      module.resolver = _LazyResolver(self, module)
+      self._resolvers[module_name] = module.resolver
+      return ast
     try:
       module.ast = self._load_and_resolve_ast_dependencies(module.ast,
-                                                           module_name)
+                                                           module_name,
+                                                           module)
       # Now that any imported TypeVar instances have been resolved, adjust type
       # parameters in classes and functions.
       module.ast = module.ast.Visit(visitors.AdjustTypeParameters())
@@ -114,16 +531,194 @@ class Loader(object):
       module.ast.Visit(
           visitors.FillInModuleClasses({"": module.ast,
                                         module_name: module.ast}))
+      # For the same reason, this is the place to share equal nodes within the
+      # module. Interning keeps the internal cls pointers up to date.
+      module.ast = module.ast.Visit(visitors.InternNodes())
       self._verify_ast(module.ast)
     except:
       del self._modules[module_name]  # don't leave half-resolved modules around
       raise
+    if self._cache and key:
+      self._store_in_cache(module)
     return module.ast
 
-  def _load_and_resolve_ast_dependencies(self, ast, ast_name=None):
+  def _load_from_cache(self, module_name, filename, key):
+    """Try to load a resolved module from the ModuleCache.
+
+    Args:
+      module_name: The name of the module.
+      filename: The filename of the module.
+      key: The Module.key of the module.
+    Returns:
+      The module's AST, or None if the cache doesn't have an up-to-date entry.
+    """
+    entry = self._cache.load(key)
+    if entry is not None:
+      ast, dependencies, dependency_keys = entry
+      def up_to_date():
+        return all(name in self._modules and self._modules[name].key == k
+                   for name, k in dependency_keys.items())
+      ast = self._add_resolved_module(module_name, filename, ast, key,
+                                      dependencies, up_to_date)
+      if ast:
+        _cache_metric.inc("hit")
+        return ast
+    _cache_metric.inc("miss")
+    return None
+
+  def _load_precompiled(self, subdir, module_name):
+    """Try to load a resolved module from our PrecompiledModules."""
+    entry = self._precompiled.get(subdir, module_name)
+    if entry is None:
+      return None
+    ast, dependencies, key = entry
+    def up_to_date():
+      # If a dependency was found in the pythonpath instead, the precompiled
+      # module was resolved against the wrong file.
+      return all(self._modules[name].filename == self.PREFIX + name
+                 for name in dependencies)
+    return self._add_resolved_module(module_name, self.PREFIX + module_name,
+                                     ast, key, dependencies, up_to_date)
+
+  def _add_resolved_module(self, module_name, filename, ast, key,
+                           dependencies, up_to_date):
+    """Load the dependencies of an already resolved module and register it.
+
+    Args:
+      module_name: The name of the module.
+      filename: The filename of the module.
+      ast: The resolved module, but with ClassType pointers to other modules
+        cleared, as stored by _dump_module.
+      key: The Module.key of the module.
+      dependencies: The names of the modules this module references.
+      up_to_date: A function that's called once the dependencies have been
+        loaded, to check that they are the same the module was resolved
+        against.
+    Returns:
+      The module's AST, or None if it's out of date.
+    """
+    # Like in _load_file, the module needs to be registered before we load its
+    # dependencies, in case some of them import it back.
+    loaded_before = set(self._modules)
+    self._modules[module_name] = Module(module_name, filename, ast, key,
+                                        dependencies)
+    try:
+      valid = all(name in self._modules or self._import_name(name)
+                  for name in dependencies) and up_to_date()
+    except BadDependencyError:
+      valid = False
+    except:
+      self._unload_modules_except(loaded_before)
+      raise
+    if not valid:
+      # Modules loaded in the meantime might have been resolved against this
+      # outdated module.
+      self._unload_modules_except(loaded_before)
+      return None
+    module_map = self._module_map()
+    module_map[""] = ast
+    ast.Visit(visitors.FillInModuleClasses(module_map))
+    return ast
+
+  def _module_map(self):
+    """Map the names of all modules we loaded to their symbol tables."""
+    return {name: module.symbols() for name, module in self._modules.items()}
+
+  def _resolve_member(self, module, member, adjuster):
+    """Resolve a member of a lazily loaded module, except for ClassTypes.
+
+    Like _load_and_resolve_ast_dependencies followed by AdjustTypeParameters,
+    but for a single member. See _LazyResolver.
+
+    Args:
+      module: The Module the member is in.
+      member: The unresolved member.
+      adjuster: The module's visitors.AdjustTypeParameters instance.
+    Returns:
+      The resolved member. ClassType pointers still need to be filled in, using
+      _finish_member.
+    Raises:
+      BadDependencyError: If the member references something we can't find.
+    """
+    deps = visitors.CollectDependencies()
+    member.Visit(deps)
+    for name in sorted(deps.modules):
+      if name not in self._modules and self._import_name(name) is None:
+        error = "Can't find pyi for %r" % name
+        raise BadDependencyError(error, module.module_name)
+    module_map = {name: m.resolver.references if m.resolver else m.ast
+                  for name, m in self._modules.items()}
+    try:
+      member = member.Visit(visitors.LookupExternalTypes(
+          module_map, full_names=True, self_name=module.module_name))
+    except KeyError as e:
+      raise BadDependencyError(e.message, module.module_name)
+    return member.Visit(adjuster)
+
+  def _finish_member(self, module, member):
+    """Fill in the ClassType pointers of a member resolved by _resolve_member."""
+    module_map = self._module_map()
+    module_map[""] = module.symbols()
+    member.Visit(visitors.FillInModuleClasses(module_map))
+    self._verify_ast(member)
+
+  def _resolve_all(self, module):
+    """Finish resolving a module loaded with options.lazy_pyi."""
+    module.ast = module.resolver.resolve_all()
+    module.resolver = None
+    module.dirty = False
+    if self._cache and module.key:
+      self._store_in_cache(module)
+
+  def resolve_member(self, module_name, member):
+    """Resolve a member of a module returned by import_name().
+
+    With options.lazy_pyi, import_name() returns modules whose members are
+    resolved on demand, using this method. Otherwise, this returns member.
+
+    Args:
+      module_name: The name of the module.
+      member: A constant, type parameter, class, function or alias of the
+        module.
+    Returns:
+      The resolved member.
+    Raises:
+      BadDependencyError: If the member references something we can't find.
+    """
+    # Modules that have been resolved completely in the meantime (see
+    # concat_all) still hand out their unresolved members.
+    resolver = self._resolvers.get(module_name)
+    if resolver and member in resolver:
+      return resolver.resolve(member)
+    return member
+
+  def _unload_modules_except(self, module_names):
+    for name in set(self._modules) - module_names:
+      del self._modules[name]
+
+  def _store_in_cache(self, module):
+    """Store a resolved module in the ModuleCache, if possible."""
+    dependency_keys = {}
+    todo = list(module.dependencies)
+    while todo:
+      name = todo.pop()
+      if name in dependency_keys or name == module.module_name:
+        continue
+      dependency = self._modules.get(name)
+      if dependency is None or dependency.key is None:
+        return  # depends on something we can't verify
+      dependency_keys[name] = dependency.key
+      todo.extend(dependency.dependencies)
+    self._cache.store(module.key, module.ast, module.dependencies,
+                      dependency_keys)
+
+  def _load_and_resolve_ast_dependencies(self, ast, ast_name=None,
+                                         module=None):
     """Fill in all ClassType.cls pointers."""
     deps = visitors.CollectDependencies()
     ast.Visit(deps)
+    if module:
+      module.dependencies = tuple(sorted(deps.modules))
     if deps.modules:
       for name in deps.modules:
         if name not in self._modules:
@@ -131,8 +726,7 @@ class Loader(object):
           if other_ast is None:
             error = "Can't find pyi for %r" % name
             raise BadDependencyError(error, ast_name or ast.name)
-      module_map = {name: module.ast
-                    for name, module in self._modules.items()}
+      module_map = self._module_map()
       try:
         ast = ast.Visit(visitors.LookupExternalTypes(
             module_map, full_names=True, self_name=ast_name))
@@ -141,8 +735,7 @@ class Loader(object):
     return ast
 
   def _finish_ast(self, ast):
-    module_map = {name: module.ast
-                  for name, module in self._modules.items()}
+    module_map = self._module_map()
     module_map[""] = ast  # The module itself (local lookup)
     ast.Visit(visitors.FillInModuleClasses(module_map))
 
@@ -164,7 +757,9 @@ class Loader(object):
 
   def _lookup_all_classes(self):
     for module in self._modules.values():
-      if module.dirty:
+      # Lazily resolved modules fill in the pointers of every member they
+      # resolve.
+      if module.dirty and not module.resolver:
         self._finish_ast(module.ast)
         module.dirty = False
 
@@ -210,22 +805,45 @@ class Loader(object):
     self._lookup_all_classes()
     return ast
 
-  def _load_builtin(self, subdir, module_name, typeshed_only=False):
-    """Load a pytd/pyi that ships with pytype or typeshed."""
-    version = self.options.python_version
+  def _find_builtin(self, subdir, module_name, typeshed_only=False):
+    """Find a pytd/pyi that ships with pytype or typeshed.
+
+    Args:
+      subdir: The directory to look in, e.g. "builtins" or "stdlib".
+      module_name: The name of the module. May contain dots.
+      typeshed_only: Whether to skip our own type definitions.
+    Returns:
+      A tuple of the filename and the source of the module, or None.
+    """
     # Try our own type definitions first.
-    if typeshed_only:
-      mod = None
-    else:
-      mod = builtins.ParsePredefinedPyTD(subdir, module_name, version)
-    if not mod and self.options.typeshed:
+    if not typeshed_only:
+      try:
+        src = pytd_utils.GetPredefinedFile(subdir, module_name)
+      except IOError:
+        pass
+      else:
+        return os.path.join(subdir, module_name + ".pytd"), src
+    if self.options.typeshed:
       # Fall back to typeshed.
-      mod = typeshed.parse_type_definition(subdir, module_name, version)
-    if mod:
+      return typeshed.get_type_definition_file(
+          subdir, module_name, self.options.python_version)
+    return None
+
+  def _load_builtin(self, subdir, module_name, typeshed_only=False):
+    """Load a pytd/pyi that ships with pytype or typeshed."""
+    if (self._precompiled and not typeshed_only and
+        module_name not in self._modules):
+      ast = self._load_precompiled(subdir, module_name)
+      if ast:
+        return ast
+    found = self._find_builtin(subdir, module_name, typeshed_only)
+    if found:
       log.debug("Found %s entry for %r", subdir, module_name)
+      src_filename, src = found
       return self._load_file(filename=self.PREFIX + module_name,
                              module_name=module_name,
-                             ast=mod)
+                             src=src,
+                             src_filename=src_filename)
     return None
 
   def _import_name(self, module_name):
@@ -263,6 +881,7 @@ class Loader(object):
       if mod:
         return mod
 
+    self._missing_modules.add(module_name)
     log.warning("Couldn't import module %s %r in (path=%r) imports_map: %s",
                 module_name, module_name, self.options.pythonpath,
                 "%d items" % len(self.options.imports_map) if
@@ -334,7 +953,46 @@ class Loader(object):
     else:
       return None
 
+  def get_module_keys(self):
+    """Get the keys of all modules we tried to import.
+
+    Returns:
+      A dictionary mapping module names to Module.key, or to None for modules
+      we didn't find. None if the source of one of the modules is unknown.
+    """
+    keys = dict.fromkeys(self._missing_modules)
+    for name, module in self._modules.items():
+      if module.key is None:
+        return None
+      keys[name] = module.key
+    return keys
+
+  def verify_module_keys(self, keys):
+    """Check whether importing modules would give the same result as before.
+
+    Args:
+      keys: The result of get_module_keys(), on a Loader with the same options.
+    Returns:
+      True if all modules (including the ones that weren't found) still resolve
+      to the same source.
+    """
+    for name, key in sorted(keys.items()):
+      try:
+        ast = self._import_name(name)
+      except BadDependencyError:
+        return False
+      if (self._modules[name].key if ast else None) != key:
+        return False
+    return True
+
   def concat_all(self):
+    if self.options.lazy_pyi:
+      # Resolving a module can import more modules.
+      lazy = [m for m in self._modules.values() if m.resolver]
+      while lazy:
+        for module in lazy:
+          self._resolve_all(module)
+        lazy = [m for m in self._modules.values() if m.resolver]
     if not self._concatenated:
       self._concatenated = pytd_utils.Concat(
           *(module.ast for module in self._modules.values()),
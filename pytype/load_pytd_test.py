@@ -1,11 +1,15 @@
 """Tests for load_pytd.py."""
 
+import cStringIO
+import os
+import textwrap
 import unittest
 
 from pytype import config
 from pytype import load_pytd
 from pytype import utils
 from pytype.pytd import pytd
+from pytype.pytd.parse import builtins
 
 import unittest
 
@@ -82,6 +86,24 @@ class ImportPathsTest(unittest.TestCase):
       f, = module1.Lookup("module1.get_bar").signatures
       self.assertEquals("module2.Bar", f.return_type.cls.name)
 
+  def testInternedModule(self):
+    with utils.Tempdir() as d:
+      d.create_file("m.pyi", """
+        def f() -> A
+        class A:
+          def a(self, x: int, y: int) -> A
+      """)
+      self.options.tweak(pythonpath=[d.path])
+      loader = load_pytd.Loader("base", self.options)
+      m = loader.import_name("m")
+      a = m.Lookup("m.A")
+      f, = m.Lookup("m.f").signatures
+      method, = a.Lookup("a").signatures
+      self.assertIs(a, f.return_type.cls)
+      self.assertIs(a, method.return_type.cls)
+      self.assertIs(f.return_type, method.return_type)
+      self.assertIs(method.params[1].type, method.params[2].type)
+
   def testCircularDependency(self):
     with utils.Tempdir() as d:
       d.create_file("foo.pyi", """
@@ -174,6 +196,157 @@ class ImportPathsTest(unittest.TestCase):
       self.assertEquals("empty1", empty1.name)
       self.assertEquals("empty2", empty2.name)
 
+  def testCache(self):
+    with utils.Tempdir() as d:
+      d.create_file("module1.pyi", "def get_bar() -> module2.Bar")
+      d.create_file("module2.pyi", "class Bar:\n  pass")
+      self.options.tweak(pythonpath=[d.path],
+                         pyi_cache_dir=os.path.join(d.path, "cache"))
+      for _ in range(2):
+        loader = load_pytd.Loader("base", self.options)
+        module1 = loader.import_name("module1")
+        f, = module1.Lookup("module1.get_bar").signatures
+        self.assertEquals("module2.Bar", f.return_type.cls.name)
+        self.assertIs(loader.import_name("module2").Lookup("module2.Bar"),
+                      f.return_type.cls)
+      self.assertTrue(os.listdir(self.options.pyi_cache_dir))
+
+  def testCacheOutdatedDependency(self):
+    with utils.Tempdir() as d:
+      d.create_file("module1.pyi", "x = ...  # type: module2.Y")
+      d.create_file("module2.pyi", "Y = int")
+      self.options.tweak(pythonpath=[d.path],
+                         pyi_cache_dir=os.path.join(d.path, "cache"))
+      loader = load_pytd.Loader("base", self.options)
+      x = loader.import_name("module1").Lookup("module1.x")
+      self.assertEquals("int", pytd.Print(x.type))
+      d.create_file("module2.pyi", "Y = str")
+      loader = load_pytd.Loader("base", self.options)
+      x = loader.import_name("module1").Lookup("module1.x")
+      self.assertEquals("str", pytd.Print(x.type))
+
+  def testLazy(self):
+    with utils.Tempdir() as d:
+      d.create_file("module1.pyi", textwrap.dedent("""
+        def get_bar() -> module2.Bar
+        def get_baz() -> module3.Baz
+      """))
+      d.create_file("module2.pyi", "class Bar:\n  pass")
+      d.create_file("module3.pyi", "class Baz:\n  pass")
+      self.options.tweak(pythonpath=[d.path], lazy_pyi=True)
+      loader = load_pytd.Loader("base", self.options)
+      module1 = loader.import_name("module1")
+      self.assertNotIn("module2", loader.get_module_keys())
+      f = loader.resolve_member("module1", module1.Lookup("module1.get_bar"))
+      self.assertIs(f, loader.resolve_member("module1",
+                                             module1.Lookup("module1.get_bar")))
+      self.assertNotIn("module3", loader.get_module_keys())
+      module2 = loader.import_name("module2")
+      bar = loader.resolve_member("module2", module2.Lookup("module2.Bar"))
+      self.assertIs(bar, f.signatures[0].return_type.cls)
+
+  def testLazyCycle(self):
+    with utils.Tempdir() as d:
+      d.create_file("module1.pyi", textwrap.dedent("""
+        class A:
+          def get_b(self) -> module2.B
+      """))
+      d.create_file("module2.pyi", textwrap.dedent("""
+        class B:
+          def get_a(self) -> module1.A
+      """))
+      self.options.tweak(pythonpath=[d.path], lazy_pyi=True)
+      loader = load_pytd.Loader("base", self.options)
+      module1 = loader.import_name("module1")
+      a = loader.resolve_member("module1", module1.Lookup("module1.A"))
+      b = a.Lookup("get_b").signatures[0].return_type.cls
+      self.assertEquals("module2.B", b.name)
+      self.assertIs(a, b.Lookup("get_a").signatures[0].return_type.cls)
+      all_modules = loader.concat_all()
+      self.assertIs(a, all_modules.Lookup("module1.A"))
+      self.assertIs(b, all_modules.Lookup("module2.B"))
+      self.assertIs(a, loader.resolve_member("module1",
+                                             module1.Lookup("module1.A")))
+
+  def testLazyMissingDependency(self):
+    with utils.Tempdir() as d:
+      d.create_file("module1.pyi", textwrap.dedent("""
+        x = ...  # type: int
+        y = ...  # type: module2.Y
+      """))
+      self.options.tweak(pythonpath=[d.path], lazy_pyi=True)
+      loader = load_pytd.Loader("base", self.options)
+      module1 = loader.import_name("module1")
+      x = loader.resolve_member("module1", module1.Lookup("module1.x"))
+      self.assertEquals("int", pytd.Print(x.type))
+      self.assertRaises(load_pytd.BadDependencyError, loader.resolve_member,
+                        "module1", module1.Lookup("module1.y"))
+
+
+class PrecompiledTest(unittest.TestCase):
+  """Tests for load_pytd.Precompile and load_pytd.LoadPrecompiled."""
+
+  def setUp(self):
+    self.options = config.Options.create(python_version=(2, 7),
+                                         typeshed=False)
+
+  def tearDown(self):
+    load_pytd._precompiled_modules = None
+    builtins._cached_builtins_pytd = None
+
+  def _precompile(self):
+    f = cStringIO.StringIO()
+    load_pytd.Precompile(f, self.options)
+    builtins._cached_builtins_pytd = None
+    load_pytd.LoadPrecompiled(cStringIO.StringIO(f.getvalue()))
+
+  def testStdlib(self):
+    self._precompile()
+    loader = load_pytd.Loader("base", self.options)
+    self.assertTrue(loader._precompiled)
+    ast = loader.import_name("collections")
+    cls = ast.Lookup("collections.Counter")
+    self.assertIs(loader.import_name("__builtin__").Lookup("__builtin__.dict"),
+                  cls.parents[0].base_type.cls)
+
+  def testPythonpathTakesPrecedence(self):
+    self._precompile()
+    with utils.Tempdir() as d:
+      d.create_file("collections.pyi", "x = ...  # type: int")
+      self.options.tweak(pythonpath=[d.path])
+      loader = load_pytd.Loader("base", self.options)
+      ast = loader.import_name("collections")
+      self.assertTrue(ast.Lookup("collections.x"))
+
+  def testOtherVersion(self):
+    self._precompile()
+    self.options.tweak(python_version=(3, 6))
+    loader = load_pytd.Loader("base", self.options)
+    self.assertIsNone(loader._precompiled)
+
+  def testRetainModules(self):
+    loader = load_pytd.Loader("base", self.options)
+    loader.import_name("collections")
+    load_pytd.RetainModules(loader)
+    loader = load_pytd.Loader("base", self.options)
+    self.assertIn("collections", loader._precompiled)
+    cls = loader.import_name("collections").Lookup("collections.Counter")
+    self.assertIs(loader.import_name("__builtin__").Lookup("__builtin__.dict"),
+                  cls.parents[0].base_type.cls)
+
+  def testRetainModulesWithShadowedDependency(self):
+    with utils.Tempdir() as d:
+      d.create_file("_ctypes.pyi", "\n".join(
+          "class %s(object): ..." % name for name in (
+              "PyCArrayType", "PyCFuncPtrType", "PyCPointerType",
+              "PyCSimpleType", "PyCStructType", "UnionType")))
+      self.options.tweak(pythonpath=[d.path])
+      loader = load_pytd.Loader("base", self.options)
+      loader.import_name("ctypes")
+      load_pytd.RetainModules(loader)
+    self.assertNotIn("ctypes", load_pytd._precompiled_modules)
+    self.assertNotIn("_ctypes", load_pytd._precompiled_modules)
+
 
 if __name__ == "__main__":
   unittest.main()
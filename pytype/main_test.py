@@ -2,6 +2,7 @@
 
 import csv
 import hashlib
+import json
 import os
 import subprocess
 import textwrap
@@ -57,7 +58,7 @@ class PytypeTest(unittest.TestCase):
     self.tmp_files.add(path)
     return path
 
-  def _RunPytype(self, pytype_args_dict):
+  def _RunPytype(self, pytype_args_dict, stdin=None):
     """A single command-line call to the pytype binary.
 
     Typically you'll want to use _CheckTypesAndErrors or
@@ -71,6 +72,7 @@ class PytypeTest(unittest.TestCase):
        the binary name. For example, to run
           pytype simple.py --output=-
        the arguments should be {"simple.py": self.INCLUDE, "--output": "-"}
+      stdin: Optionally, a string to send to pytype's stdin.
     """
     pytype_exe = os.path.join(self.pytype_dir, "pytype")
     pytype_args = [pytype_exe]
@@ -79,8 +81,9 @@ class PytypeTest(unittest.TestCase):
         arg += "=" + str(value)
       pytype_args.append(arg)
     p = subprocess.Popen(
-        pytype_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    self.stdout, self.stderr = p.communicate()
+        pytype_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    self.stdout, self.stderr = p.communicate(stdin)
     self.returncode = p.returncode
 
   def assertOutputStateMatches(self, **has_output):
@@ -220,6 +223,86 @@ class PytypeTest(unittest.TestCase):
     self.assertTrue(parser.parse_string(pyi).ASTeq(
         parser.parse_string(expected_pyi)))
 
+  def testJobs(self):
+    a_py, a_pyi = self._TmpPath("a.py"), self._TmpPath("a.pyi")
+    b_py, b_pyi = self._TmpPath("b.py"), self._TmpPath("b.pyi")
+    imports_info = self._TmpPath("imports_info")
+    with open(a_py, "w") as f:
+      print >>f, "def f():\n  return 3"
+    with open(b_py, "w") as f:
+      print >>f, "import a\ndef g():\n  return a.f()"
+    with open(imports_info, "w") as f:
+      print >>f, "a.py %s\nb.py %s" % (a_pyi, b_pyi)
+    # Put the dependent file first, so that the dependency graph is needed to
+    # get the right result.
+    self.pytype_args[b_py + ":" + b_pyi] = self.INCLUDE
+    self.pytype_args[a_py + ":" + a_pyi] = self.INCLUDE
+    self.pytype_args["--imports_info"] = imports_info
+    self.pytype_args["--jobs"] = 2
+    self._RunPytype(self.pytype_args)
+    self.assertOutputStateMatches(stdout=False, stderr=False, returncode=False)
+    with open(b_pyi, "r") as f:
+      self.assertIn("def g() -> int", f.read())
+
+  def testJobsWithCycle(self):
+    paths = {name: (self._TmpPath(name + ".py"), self._TmpPath(name + ".pyi"))
+             for name in "abc"}
+    imports_info = self._TmpPath("imports_info")
+    with open(paths["a"][0], "w") as f:
+      print >>f, "import b\ndef f():\n  return 3\ndef g():\n  return b.h()"
+    with open(paths["b"][0], "w") as f:
+      print >>f, "import a\ndef h():\n  return a.f()"
+    with open(paths["c"][0], "w") as f:
+      print >>f, "import a\ndef k():\n  return a.f()"
+    with open(imports_info, "w") as f:
+      for name, (_, pyi) in sorted(paths.items()):
+        print >>f, "%s.py %s" % (name, pyi)
+    for py, pyi in paths.values():
+      self.pytype_args[py + ":" + pyi] = self.INCLUDE
+    self.pytype_args["--imports_info"] = imports_info
+    self.pytype_args["--jobs"] = 2
+    self._RunPytype(self.pytype_args)
+    self.assertOutputStateMatches(stdout=False, stderr=False, returncode=False)
+    # b is processed twice, so its second pass sees the output of a.
+    with open(paths["b"][1], "r") as f:
+      self.assertIn("def h() -> int", f.read())
+    with open(paths["c"][1], "r") as f:
+      self.assertIn("def k() -> int", f.read())
+
+  def testServer(self):
+    requests = [
+        {"args": [self._DataPath("simple.py"), "--output=-"]},
+        {"args": [self._DataPath("simple.py"), "--output=-"],
+         "src": "def f():\n  return 1 + ''\n"},
+    ]
+    self.pytype_args["--server"] = self.INCLUDE
+    self._RunPytype(self.pytype_args,
+                    "".join(json.dumps(r) + "\n" for r in requests))
+    self.assertOutputStateMatches(stdout=True, stderr=False, returncode=False)
+    first, second = [json.loads(line) for line in self.stdout.splitlines()]
+    with open(self._DataPath("simple.pyi"), "r") as f:
+      expected_pyi = f.read()
+    self.assertTrue(parser.parse_string(first["pyi"]).ASTeq(
+        parser.parse_string(expected_pyi)))
+    self.assertEquals([], first["errors"])
+    self.assertEquals(0, first["exit_code"])
+    error, = second["errors"]
+    self.assertIn("unsupported-operands", error)
+    self.assertEquals(1, second["exit_code"])
+
+  def testServerBadRequest(self):
+    requests = [
+        {"args": ["--no-such-flag", self._DataPath("simple.py")]},
+        {"args": [self._DataPath("simple.py"), "--output=-"]},
+    ]
+    self.pytype_args["--server"] = self.INCLUDE
+    self._RunPytype(self.pytype_args,
+                    "".join(json.dumps(r) + "\n" for r in requests))
+    first, second = [json.loads(line) for line in self.stdout.splitlines()]
+    self.assertIn("Invalid arguments", first["exception"])
+    self.assertEquals([], second["errors"])
+    self.assertEquals(0, second["exit_code"])
+
   def testPytree(self):
     """Test pytype on a real-world program."""
     self.pytype_args["--quick"] = self.INCLUDE
@@ -51,11 +51,13 @@ class AbstractMatcher(object):
         match.
       subst: Type parameter substitutions.
     Returns:
-      A list of all the views of var that didn't match.
+      A list of all the views of var that didn't match. Bindings with the same
+      type key are only matched once, so only one view is returned for them.
     """
     subst = subst or {}
     bad = []
-    for view in abstract.get_views([var], node, filter_strict=True):
+    for view in abstract.get_views([var], node, filter_strict=True,
+                                   group_by_type=True):
       if self.match_var_against_type(var, other_type, subst,
                                      node, view) is None:
         bad.append(view)
@@ -18,6 +18,7 @@ def bar(n):
   _my_counter.inc(n)  # calls to bar() count as n units.
 """
 
+import copy
 import math
 import re
 import time
@@ -41,6 +42,11 @@ def _prepare_for_test(enabled=True):
   _enabled = enabled
 
 
+def enabled():
+  """Return True iff metrics are being collected."""
+  return _enabled
+
+
 def get_metric(name, constructor, *args, **kwargs):
   """Return an existing metric or create a new one for the given name.
 
@@ -70,7 +76,12 @@ def get_report():
 
 def merge_from_file(metrics_file):
   """Merge metrics recorded in another file into the current metrics."""
-  for metric in yaml.load(metrics_file):
+  merge_metrics(yaml.load(metrics_file))
+
+
+def merge_metrics(metric_list):
+  """Merge a list of metrics (e.g. from another process) into ours."""
+  for metric in metric_list:
     existing = _registered_metrics.get(metric.name)
     if existing is None:
       _registered_metrics[metric.name] = metric
@@ -80,6 +91,22 @@ def merge_from_file(metrics_file):
       existing._merge(metric)  # pylint: disable=protected-access
 
 
+def pop_metrics():
+  """Return a copy of all metrics and reset the registered ones.
+
+  This is used by worker processes that handle several files: The metrics for
+  each file are sent to the parent process (which combines them using
+  merge_metrics()), and the worker starts over for the next file.
+
+  Returns:
+    A list of Metric instances that aren't registered.
+  """
+  result = copy.deepcopy(_registered_metrics.values())
+  for metric in _registered_metrics.values():
+    metric._reset()  # pylint: disable=protected-access
+  return result
+
+
 class Metric(object):
   """Abstract base class for metrics."""
 
@@ -90,12 +117,17 @@ class Metric(object):
     if name in _registered_metrics:
       raise ValueError("Metric %s has already been defined." % name)
     self._name = name
+    self._reset()
     _registered_metrics[name] = self
 
   @property
   def name(self):
     return self._name
 
+  def _reset(self):
+    """Reset the metric to its initial (empty) state."""
+    raise NotImplementedError
+
   def _summary(self):
     """Return a string sumamrizing the value of the metric."""
     raise NotImplementedError
@@ -111,8 +143,7 @@ class Metric(object):
 class Counter(Metric):
   """A monotonically increasing metric."""
 
-  def __init__(self, name):
-    super(Counter, self).__init__(name)
+  def _reset(self):
     self._total = 0
 
   def inc(self, count=1):
@@ -134,8 +165,8 @@ class Counter(Metric):
 class StopWatch(Metric):
   """A counter that measures the time spent in a "with" statement."""
 
-  def __init__(self, name):
-    super(StopWatch, self).__init__(name)
+  def _reset(self):
+    self._total = 0
 
   def __enter__(self):
     self._start_time = time.clock()
@@ -155,8 +186,7 @@ class StopWatch(Metric):
 class MapCounter(Metric):
   """A set of related counters keyed by an arbitrary string."""
 
-  def __init__(self, name):
-    super(MapCounter, self).__init__(name)
+  def _reset(self):
     self._counts = {}
     self._total = 0
 
@@ -192,8 +222,7 @@ class MapCounter(Metric):
 class Distribution(Metric):
   """A metric to track simple statistics from a distribution of values."""
 
-  def __init__(self, name):
-    super(Distribution, self).__init__(name)
+  def _reset(self):
     self._count = 0  # Number of values.
     self._total = 0.0  # Sum of the values.
     self._squared = 0.0  # Sum of the squares of the values.
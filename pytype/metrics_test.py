@@ -77,6 +77,21 @@ class MetricsTest(unittest.TestCase):
     self.assertRaises(TypeError, metrics.merge_from_file,
                       cStringIO.StringIO(dump))
 
+  def test_pop_and_merge(self):
+    c = metrics.Counter("foo")
+    d = metrics.Distribution("bar")
+    c.inc(3)
+    d.add(5)
+    popped = metrics.pop_metrics()
+    self.assertEquals(0, c._total)
+    self.assertEquals(0, d._count)
+    self.assertItemsEqual(["foo", "bar"], [m.name for m in popped])
+    c.inc(1)
+    metrics.merge_metrics(popped)
+    self.assertEquals(4, c._total)
+    self.assertEquals(1, d._count)
+    self.assertEquals(5, d._max)
+
   def test_get_metric(self):
     c1 = metrics.get_metric("foo", metrics.Counter)
     self.assertIsInstance(c1, metrics.Counter)
@@ -265,7 +280,9 @@ class MetricsContextTest(unittest.TestCase):
     with tempfile.NamedTemporaryFile() as out:
       out.close()
       with metrics.MetricsContext(out.name):
+        self.assertTrue(metrics.enabled())
         self._counter.inc()
+      self.assertFalse(metrics.enabled())
       self.assertEquals(1, self._counter._total)
       with open(out.name) as f:
         dumped = yaml.load(f)
@@ -275,6 +292,7 @@ class MetricsContextTest(unittest.TestCase):
 
   def test_disabled(self):
     with metrics.MetricsContext(""):
+      self.assertFalse(metrics.enabled())
       self._counter.inc()
     self.assertEquals(0, self._counter._total)
 
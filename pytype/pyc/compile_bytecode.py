@@ -26,25 +26,88 @@ def write_pyc(f, codeobject, source_size=0, timestamp=0):
   f.write(marshal.dumps(codeobject))
 
 
-def compile_to_pyc(data_file, filename, output, mode="exec"):
-  with open(data_file, "r") as fi:
-    src = fi.read()
+def _to_bytes(s):
+  return s if isinstance(s, bytes) else s.encode("utf-8")
+
+
+def _to_str(b):
+  return b if isinstance(b, str) else b.decode("utf-8")
+
+
+def compile_src_to_pyc(src, filename, output, mode="exec"):
+  """Compile src and write a status byte, followed by the pyc or the error."""
   try:
     codeobject = compile(src, filename, mode)
   except Exception as err:  # pylint: disable=broad-except
     output.write(b"\1")
-    output.write(str(err))
+    output.write(_to_bytes(str(err)))
   else:
     output.write(b"\0")
     write_pyc(output, codeobject)
 
 
+def compile_to_pyc(data_file, filename, output, mode="exec"):
+  with open(data_file, "r") as fi:
+    src = fi.read()
+  compile_src_to_pyc(src, filename, output, mode)
+
+
+def _read32(f):
+  data = bytearray(f.read(4))
+  if len(data) < 4:
+    return None
+  return data[0] | data[1] << 8 | data[2] << 16 | data[3] << 24
+
+
+class _Buffer(object):
+  """A minimal file-like object for collecting output."""
+
+  def __init__(self):
+    self.parts = []
+
+  def write(self, data):
+    self.parts.append(bytes(data))
+
+  def getvalue(self):
+    return b"".join(self.parts)
+
+
+def serve(inp, output):
+  """Compile requests from inp until it's closed.
+
+  Each request consists of the source, the filename and the mode, each
+  preceded by its length (32 bit, little endian). The response is the output
+  of compile_src_to_pyc, preceded by its length.
+
+  Args:
+    inp: A binary file object to read requests from.
+    output: A binary file object to write responses to.
+  """
+  while True:
+    fields = []
+    for _ in range(3):
+      size = _read32(inp)
+      if size is None:
+        return
+      fields.append(inp.read(size))
+    src, filename, mode = fields
+    result = _Buffer()
+    compile_src_to_pyc(src, _to_str(filename), result, _to_str(mode))
+    data = result.getvalue()
+    _write32(output, len(data))
+    output.write(data)
+    output.flush()
+
+
 def main():
+  binary = lambda f: f.buffer if hasattr(f, "buffer") else f
+  if sys.argv[1:] == ["--serve"]:
+    serve(binary(sys.stdin), binary(sys.stdout))
+    return
   if len(sys.argv) != 4:
     sys.exit(1)
-  output = sys.stdout.buffer if hasattr(sys.stdout, "buffer") else sys.stdout
   compile_to_pyc(data_file=sys.argv[1], filename=sys.argv[2],
-                 output=output, mode=sys.argv[3])
+                 output=binary(sys.stdout), mode=sys.argv[3])
 
 
 if __name__ == "__main__":
@@ -9,7 +9,10 @@ architecture issues (e.g., you can write a Python value to a file on a PC,
 Details of the format may change between Python versions.
 """
 
+import marshal
 import struct
+import sys
+import types
 
 
 TYPE_NULL = 0x30  # '0'
@@ -97,6 +100,15 @@ class CodeType(object):
     self.python_version = python_version  # This field is not in types.CodeType.
 
 
+# Little-endian readers for the fixed-size fields of the marshal format.
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+_DOUBLE = struct.Struct('<d')
+_COMPLEX = struct.Struct('<dd')
+_CODE_HEADER2 = struct.Struct('<4i')  # argcount, nlocals, stacksize, flags
+_CODE_HEADER3 = struct.Struct('<5i')  # ... plus kwonlyargcount
+
+
 class _LoadMarshal(object):
   """Stateful loader for marshalled files."""
 
@@ -115,28 +127,36 @@ class _LoadMarshal(object):
     """Load an encoded Python data structure."""
     c = '?'  # make pylint happy
     try:
-      c = self._read_byte()
+      c = ord(self.bufstr[self.bufpos])
+      self.bufpos += 1
       if c & REF:
         # This element might recursively contain other elements, which
         # themselves store things in the refs table. So we need to determine the
         # index position *before* reading the contents of this element.
         idx = self._reserve_ref()
-        result = _LoadMarshal.dispatch[c & ~REF](self)
+        result = _dispatch_table[c & ~REF](self)
         self.refs[idx] = result
       else:
-        result = _LoadMarshal.dispatch[c](self)
+        result = _dispatch_table[c](self)
       return result
-    except KeyError:
-      raise ValueError('bad marshal code: %r (%02x)' % (chr(c), c))
+    except TypeError:
+      if _dispatch_table[c & ~REF] is None:
+        raise ValueError('bad marshal code: %r (%02x)' % (chr(c), c))
+      raise
     except IndexError:
       raise EOFError
 
-  def _read(self, n):
-    """Read n bytes as a string."""
+  def _advance(self, n):
+    """Skip n bytes, returning the position they start at."""
     pos = self.bufpos
     self.bufpos += n
     if self.bufpos > len(self.bufstr):
       raise EOFError()
+    return pos
+
+  def _read(self, n):
+    """Read n bytes as a string."""
+    pos = self._advance(n)
     return self.bufstr[pos : self.bufpos]
 
   def _read_byte(self):
@@ -145,36 +165,13 @@ class _LoadMarshal(object):
     self.bufpos += 1
     return ord(self.bufstr[pos])
 
-  def _read_short(self):
-    """Read a signed 16 bit word."""
-    lo = self._read_byte()
-    hi = self._read_byte()
-    x = lo | (hi<<8)
-    if x & 0x8000:
-      # sign extension
-      x -= 0x10000
-    return x
-
   def _read_long(self):
     """Read a signed 32 bit word."""
-    s = self._read(4)
-    x = ord(s[0]) | ord(s[1])<<8 | ord(s[2])<<16 | ord(s[3])<<24
-    if ord(s[3]) & 0x80 and x > 0:
-      # sign extension
-      x = -((1<<32) - x)
-      return int(x)
-    else:
-      return x
+    return _INT32.unpack_from(self.bufstr, self._advance(4))[0]
 
   def _read_long64(self):
     """Read a signed 64 bit integer."""
-    s = self._read(8)
-    x = (ord(s[0]) | ord(s[1])<<8 | ord(s[2])<<16 | ord(s[3])<<24 |
-         ord(s[4])<<32 | ord(s[5])<<40 | ord(s[6])<<48 | ord(s[7])<<56)
-    if ord(s[7]) & 0x80 and x > 0:
-      # sign extension
-      x = -((1<<64) - x)
-    return x
+    return _INT64.unpack_from(self.bufstr, self._advance(8))[0]
 
   def _reserve_ref(self):
     """Reserve one entry in the reference table.
@@ -217,9 +214,11 @@ class _LoadMarshal(object):
   def load_long(self):
     """Load a variable length integer."""
     size = self._read_long()
+    n = abs(size)
+    # The number is stored as 15 bit digits, least significant first.
+    digits = struct.unpack_from('<%dh' % n, self.bufstr, self._advance(2 * n))
     x = 0
-    for i in xrange(abs(size)):
-      d = self._read_short()
+    for i, d in enumerate(digits):
       x |= d<<(i*15)
     return x if size >= 0 else -x
 
@@ -229,8 +228,7 @@ class _LoadMarshal(object):
     return float(s)
 
   def load_binary_float(self):
-    binary = self._read(8)
-    return struct.unpack('<d', binary)[0]
+    return _DOUBLE.unpack_from(self.bufstr, self._advance(8))[0]
 
   def load_complex(self):
     n = self._read_byte()
@@ -242,8 +240,7 @@ class _LoadMarshal(object):
     return complex(real, imag)
 
   def load_binary_complex(self):
-    binary = self._read(16)
-    return complex(*struct.unpack('dd', binary))
+    return complex(*_COMPLEX.unpack_from(self.bufstr, self._advance(16)))
 
   def load_string(self):
     n = self._read_long()
@@ -278,17 +275,13 @@ class _LoadMarshal(object):
 
   def load_small_tuple(self):
     n = self._read_byte()
-    l = []
-    for _ in xrange(n):
-      l.append(self.load())
-    return tuple(l)
+    load = self.load
+    return tuple([load() for _ in xrange(n)])
 
   def load_list(self):
     n = self._read_long()
-    l = []
-    for _ in xrange(n):
-      l.append(self.load())
-    return l
+    load = self.load
+    return [load() for _ in xrange(n)]
 
   def load_dict(self):
     d = {}
@@ -302,14 +295,13 @@ class _LoadMarshal(object):
 
   def load_code(self):
     """Load a Python code object."""
-    argcount = self._read_long()
     if self.python_version[0] >= 3:
-      kwonlyargcount = self._read_long()
+      argcount, kwonlyargcount, nlocals, stacksize, flags = (
+          _CODE_HEADER3.unpack_from(self.bufstr, self._advance(20)))
     else:
+      argcount, nlocals, stacksize, flags = _CODE_HEADER2.unpack_from(
+          self.bufstr, self._advance(16))
       kwonlyargcount = -1
-    nlocals = self._read_long()
-    stacksize = self._read_long()
-    flags = self._read_long()
     code = self.load()
     consts = self.load()
     names = self.load()
@@ -371,7 +363,46 @@ class _LoadMarshal(object):
   }
 
 
-def loads(s, python_version):
+# _LoadMarshal.dispatch as a list indexed by type code, for faster lookups.
+# Unknown type codes map to None.
+_dispatch_table = [_LoadMarshal.dispatch.get(c) for c in xrange(256)]
+
+
+def _convert_host_code(code, python_version):
+  """Convert a types.CodeType from the host interpreter to a CodeType."""
+  consts = tuple(_convert_host_code(c, python_version)
+                 if isinstance(c, types.CodeType) else c
+                 for c in code.co_consts)
+  return CodeType(code.co_argcount, getattr(code, 'co_kwonlyargcount', -1),
+                  code.co_nlocals, code.co_stacksize, code.co_flags,
+                  code.co_code, consts, code.co_names, code.co_varnames,
+                  code.co_filename, code.co_name, code.co_firstlineno,
+                  code.co_lnotab, code.co_freevars, code.co_cellvars,
+                  python_version)
+
+
+def loads(s, python_version, use_host_marshal=False):
+  """Load marshalled data.
+
+  Args:
+    s: The marshalled data, as a string.
+    python_version: The Python version that wrote the data.
+    use_host_marshal: Use the marshal module of the running interpreter. Only
+      valid if the data was written by the same interpreter version. This path
+      doesn't check for trailing bytes.
+
+  Returns:
+    The loaded value. Code objects are returned as CodeType instances.
+
+  Raises:
+    BufferError: If there is data after the value.
+  """
+  if use_host_marshal:
+    assert python_version == sys.version_info[:2]
+    result = marshal.loads(s)
+    if isinstance(result, types.CodeType):
+      result = _convert_host_code(result, python_version)
+    return result
   um = _LoadMarshal(s, python_version)
   result = um.load()
   if not um.eof():
@@ -1,5 +1,7 @@
 """Tests for loadmarshal.py."""
 
+import marshal
+import sys
 
 from pytype.pyc import loadmarshal
 import unittest
@@ -163,5 +165,37 @@ class TestLoadMarshal(unittest.TestCase):
   def test_truncated_byte(self):
     self.assertRaises(EOFError, lambda: self.load('f'))
 
+  def test_truncated_int(self):
+    self.assertRaises(EOFError, lambda: self.load('i\1\2'))
+
+  def test_truncated_long(self):
+    self.assertRaises(EOFError, lambda: self.load('l\2\0\0\0\1\0'))
+
+  def test_truncated_code(self):
+    self.assertRaises(EOFError, lambda: self.load('c\1\0\0\0\2\0\0\0'))
+
+  def test_host_marshal(self):
+    src = 'def f(x, *args):\n  return lambda: (x, 1.5, u"a", 2L, ...)\n'
+    if sys.version_info[0] == 2:
+      src = src.replace('...', 'None')
+    data = marshal.dumps(compile(src, 'test.py', 'exec'))
+    python_version = sys.version_info[:2]
+    expected = loadmarshal.loads(data, python_version)
+    actual = loadmarshal.loads(data, python_version, use_host_marshal=True)
+    self.assertCodeEqual(expected, actual)
+
+  def assertCodeEqual(self, expected, actual):
+    self.assertIsInstance(actual, loadmarshal.CodeType)
+    for name, value in expected.__dict__.items():
+      if name == 'co_consts':
+        self.assertEquals(len(value), len(actual.co_consts))
+        for const1, const2 in zip(value, actual.co_consts):
+          if isinstance(const1, loadmarshal.CodeType):
+            self.assertCodeEqual(const1, const2)
+          else:
+            self.assertEquals(const1, const2)
+      else:
+        self.assertEquals(value, getattr(actual, name))
+
 if __name__ == '__main__':
   unittest.main()
@@ -1,11 +1,13 @@
 """Functions for generating, reading and parsing pyc."""
 
 import copy
+import hashlib
+import imp
 import os
 import re
 import StringIO
+import struct
 import subprocess
-import tempfile
 
 from pytype import utils
 from pytype.pyc import compile_bytecode
@@ -32,13 +34,75 @@ class CompileError(Exception):
       self.lineno = 1
 
 
+# Compiled pyc data (including compile errors), keyed by the hash of the source
+# and the compile options. See compile_src_string_to_pyc_string.
+_pyc_cache = {}
+_MAX_CACHED_PYCS = 1000
+
+# Compile workers, keyed by the command line of the interpreter they run.
+_workers = {}
+
+
+class _CompileWorker(object):
+  """A long-lived child process that compiles source code.
+
+  Runs compile_bytecode.serve() in the target interpreter, so we don't need to
+  spawn a process for every compile.
+  """
+
+  def __init__(self, exe):
+    src = utils.load_pytype_file(COMPILE_SCRIPT)
+    self._pid = os.getpid()
+    self._process = subprocess.Popen(exe + ["-c", src, "--serve"],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE)
+
+  def usable(self):
+    # After a fork (e.g. for --jobs), the child needs its own worker, since the
+    # pipes are shared with the parent.
+    return self._pid == os.getpid() and self._process.poll() is None
+
+  def close(self):
+    """Close our ends of the pipes, which makes the child process exit."""
+    self._process.stdin.close()
+    self._process.stdout.close()
+
+  def compile(self, src, filename, mode):
+    """Compile src, see compile_bytecode.compile_src_to_pyc."""
+    for field in (src, filename, mode):
+      self._process.stdin.write(struct.pack("<I", len(field)) + field)
+    self._process.stdin.flush()
+    header = self._process.stdout.read(4)
+    if len(header) != 4:
+      raise IOError("Compile worker exited with %r" % self._process.wait())
+    size, = struct.unpack("<I", header)
+    return self._process.stdout.read(size)
+
+
+def _compile_with_worker(exe, src, filename, mode):
+  """Compile src using the _CompileWorker for the given interpreter."""
+  key = tuple(exe)
+  worker = _workers.get(key)
+  if worker is None or not worker.usable():
+    if worker:
+      worker.close()
+    worker = _workers[key] = _CompileWorker(exe)
+  try:
+    return worker.compile(src, filename, mode)
+  except:
+    del _workers[key]
+    worker.close()
+    raise
+
+
 def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
                                      mode="exec"):
   """Compile Python source code to pyc data.
 
-  This may use py_compile if the src is for the same version as we're running,
-  or else it spawns an external process to produce a .pyc file. The generated
-  bytecode (.pyc file) is read and both it and any temporary files are deleted.
+  If python_exe is "HOST", this compiles in-process. Otherwise, it sends the
+  source to a compile worker running the target interpreter, which is started
+  on first use and then kept around. Results are cached, so compiling the same
+  source again (e.g. __builtin__.py for every VM) is free.
 
   Args:
     src: Python sourcecode
@@ -57,34 +121,30 @@ def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
     CompileError: If we find a syntax error in the file.
     IOError: If our compile script failed.
   """
-  fi = tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False)
-
-  try:
-    fi.write(src)
-    fi.close()
+  if isinstance(src, unicode):
+    src = src.encode("utf-8")
+  filename = filename or "<string>"
+  key = (hashlib.sha1(src).digest(), filename, mode, python_version,
+         python_exe)
+  bytecode = _pyc_cache.get(key)
+  if bytecode is None:
     if python_exe == "HOST":
       # We were asked to use the version of Python we're running to compile.
       output = StringIO.StringIO()
-      compile_bytecode.compile_to_pyc(fi.name, filename or fi.name,
-                                      output, mode)
+      compile_bytecode.compile_src_to_pyc(src, filename, output, mode)
       bytecode = output.getvalue()
     else:
       # In order to be able to compile pyc files for both Python 2 and Python 3,
-      # we spawn an external process.
+      # we use an external process.
       if python_exe:
         # Allow python_exe to contain parameters (E.g. "-T")
         exe = python_exe.split() + ["-S"]
       else:
         exe = ["python" + ".".join(map(str, python_version))]
-      cmd = exe + ["-", fi.name, filename or fi.name, mode]
-
-      src = utils.load_pytype_file(COMPILE_SCRIPT)
-
-      p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
-      bytecode, _ = p.communicate(src)
-      assert p.poll() == 0, "Child process failed"
-  finally:
-    os.unlink(fi.name)
+      bytecode = _compile_with_worker(exe, src, filename, mode)
+    if len(_pyc_cache) >= _MAX_CACHED_PYCS:
+      _pyc_cache.clear()
+    _pyc_cache[key] = bytecode
   if bytecode[0] == chr(0):  # compile OK
     return bytecode[1:]
   elif bytecode[0] == chr(1):  # compile error
@@ -114,7 +174,10 @@ def parse_pyc_stream(fi):
   if python_version >= (3, 3):
     # This field was introduced in Python 3.3
     fi.read(4)  # raw size
-  return loadmarshal.loads(fi.read(), python_version)
+  # If the pyc was written by an interpreter like the one we're running in, the
+  # builtin marshal module can read it, which is a lot faster.
+  use_host_marshal = magic_word + crlf == imp.get_magic()
+  return loadmarshal.loads(fi.read(), python_version, use_host_marshal)
 
 
 def parse_pyc_string(data):
@@ -1,6 +1,9 @@
 """Tests for pyc.py."""
 
+import StringIO
+import struct
 
+from pytype.pyc import compile_bytecode
 from pytype.pyc import opcodes
 from pytype.pyc import pyc
 import unittest
@@ -92,5 +95,49 @@ class TestPyc(unittest.TestCase):
                        ("RETURN_VALUE", 3)], op_and_line)
 
 
+class TestCompileWorker(unittest.TestCase):
+  """Tests for compiling with long-lived compile workers."""
+
+  def _compile(self, src):
+    return pyc.compile_src_string_to_pyc_string(
+        src, filename="test_input.py", python_version=(2, 7), python_exe=None)
+
+  def test_reuse_worker(self):
+    self._compile("x = 1")
+    workers = dict(pyc._workers)
+    self._compile("x = 2")
+    self.assertEquals(workers, pyc._workers)
+
+  def test_cache(self):
+    pyc_data = self._compile("x = 3")
+    for worker in pyc._workers.values():
+      worker.close()
+    pyc._workers.clear()
+    self.assertEquals(pyc_data, self._compile("x = 3"))
+    self.assertFalse(pyc._workers)
+
+  def test_restart_worker(self):
+    self._compile("x = 4")
+    for worker in pyc._workers.values():
+      worker._process.kill()
+      worker._process.wait()
+    code = pyc.parse_pyc_string(self._compile("y = 5"))
+    self.assertIn("y", code.co_names)
+
+  def test_serve(self):
+    request = StringIO.StringIO()
+    for field in ("x = 6", "test_input.py", "exec"):
+      request.write(struct.pack("<I", len(field)) + field)
+    request.seek(0)
+    output = StringIO.StringIO()
+    compile_bytecode.serve(request, output)
+    output.seek(0)
+    size, = struct.unpack("<I", output.read(4))
+    data = output.read()
+    self.assertEquals(size, len(data))
+    self.assertEquals(chr(0), data[0])
+    self.assertIn("x", pyc.parse_pyc_string(data[1:]).co_names)
+
+
 if __name__ == "__main__":
   unittest.main()
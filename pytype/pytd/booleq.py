@@ -576,3 +576,214 @@ class Solver(object):
 
     self.assignments = assignments
     return assignments
+
+
+# Tags of the compiled terms used by BitsetSolver. A compiled term is either
+# TRUE, FALSE or a tuple whose first element is one of these.
+_EQ_VALUE = 0  # (_EQ_VALUE, variable, value bit)
+_EQ_VARIABLES = 1  # (_EQ_VARIABLES, variable, variable)
+_AND = 2  # (_AND, tuple of terms)
+_OR = 3  # (_OR, tuple of terms)
+
+
+def _combine(tag, exprs):
+  """Like simplify_exprs, for compiled terms."""
+  stop_term, skip_term = (FALSE, TRUE) if tag == _AND else (TRUE, FALSE)
+  result = []
+  for e in exprs:
+    if e is stop_term:
+      return stop_term
+    elif e is skip_term:
+      continue
+    elif e[0] == tag:
+      result.extend(e[1])
+    else:
+      result.append(e)
+  if len(result) > 1:
+    return (tag, tuple(result))
+  elif result:
+    return result[0]
+  else:
+    return skip_term
+
+
+def _simplify(term, assignments):
+  """Like BooleanTerm.simplify, for compiled terms."""
+  if term is TRUE or term is FALSE:
+    return term
+  tag = term[0]
+  if tag == _EQ_VALUE:
+    return term if assignments[term[1]] & term[2] else FALSE
+  elif tag == _EQ_VARIABLES:
+    return term
+  else:
+    return _combine(tag, (_simplify(e, assignments) for e in term[1]))
+
+
+def _extract_pivots(term, assignments):
+  """Like BooleanTerm.extract_pivots, for compiled terms.
+
+  Args:
+    term: A compiled term.
+    assignments: A list with the bitset of possible values of each variable.
+
+  Returns:
+    A dictionary mapping variables (indices) to bitsets of values.
+  """
+  if term is TRUE or term is FALSE:
+    return {}
+  tag = term[0]
+  if tag == _EQ_VALUE:
+    # Solver.solve ignores the pivot for the value, so we don't return it.
+    return {term[1]: term[2]}
+  elif tag == _EQ_VARIABLES:
+    intersection = assignments[term[1]] & assignments[term[2]]
+    return {term[1]: intersection, term[2]: intersection}
+  pivots = {}
+  if tag == _AND:
+    for expr in term[1]:
+      for var, values in _extract_pivots(expr, assignments).items():
+        pivots[var] = pivots[var] & values if var in pivots else values
+    return {var: values for var, values in pivots.items() if values}
+  else:
+    for expr in term[1]:
+      for var, values in _extract_pivots(expr, assignments).items():
+        pivots[var] = pivots[var] | values if var in pivots else values
+    return pivots
+
+
+def _iter_bits(bits):
+  """Iterate over the indices of the bits that are set in an integer."""
+  digits = bin(bits)[:1:-1]
+  index = digits.find("1")
+  while index != -1:
+    yield index
+    index = digits.find("1", index + 1)
+
+
+class BitsetSolver(Solver):
+  """A Solver that works on interned names and bitsets.
+
+  This uses the same rewriting rules as Solver. Before solving, it interns
+  variable and value names to integers and translates every BooleanTerm into
+  nested tuples. The possible values of a variable are a Python integer used as
+  a bitset. This avoids the many sets, frozensets and BooleanTerm instances
+  that Solver.solve creates.
+
+  Like Solver, the result can depend on the order in which variables and
+  values are visited, in which case the two solvers may disagree on how far
+  to narrow down some variables.
+  """
+
+  def _compile(self, term, variables, values, cache):
+    """Translate a BooleanTerm into a compiled term.
+
+    Args:
+      term: A BooleanTerm.
+      variables: A dictionary mapping variable names to integers.
+      values: A dictionary mapping value names to bit indices. New values are
+        added to it.
+      cache: A dictionary mapping ids of BooleanTerms to compiled terms.
+
+    Returns:
+      A compiled term.
+    """
+    if term is TRUE or term is FALSE:
+      return term
+    compiled = cache.get(id(term))
+    if compiled is None:
+      if isinstance(term, _Eq):
+        # _complete() already verified that the left side is a variable.
+        if term.right in variables:
+          compiled = (_EQ_VARIABLES, variables[term.left],
+                      variables[term.right])
+        else:
+          value = values.setdefault(term.right, len(values))
+          compiled = (_EQ_VALUE, variables[term.left], 1 << value)
+      else:
+        tag = _AND if isinstance(term, _And) else _OR
+        compiled = (tag, tuple(self._compile(e, variables, values, cache)
+                               for e in term.exprs))
+      cache[id(term)] = compiled
+    return compiled
+
+  def solve(self):
+    """Solve the system of equations. See Solver.solve()."""
+    if self.assignments:
+      return self.assignments
+
+    self._complete()
+
+    var_names = list(self.variables)
+    variables = {name: i for i, name in enumerate(var_names)}
+    values = {}
+    cache = {}
+    # For every variable, a bitset of its possible values, and the
+    # implications of those values that aren't TRUE (yet). The implications
+    # that are TRUE stay TRUE, so we don't need to look at them again.
+    assignments = [0] * len(var_names)
+    implications = [{} for _ in var_names]
+    for var, name in enumerate(var_names):
+      for value_name, implication in self.implications[name].items():
+        if implication is not FALSE:
+          value = values.setdefault(value_name, len(values))
+          assignments[var] |= 1 << value
+          if implication is not TRUE:
+            implications[var][value] = self._compile(
+                implication, variables, values, cache)
+    true_values = [assignments[var] & ~sum(1 << value for value in implied)
+                   for var, implied in enumerate(implications)]
+
+    def restrict(var, possible_values):
+      """Restrict a variable to possible_values. Returns True on change."""
+      before = assignments[var]
+      assignments[var] &= possible_values
+      if assignments[var] == before:
+        return False
+      var_implications = implications[var]
+      for value in var_implications.keys():
+        if not assignments[var] & (1 << value):
+          del var_implications[value]
+      return True
+
+    ground_truth = self._compile(self.ground_truth, variables, values, cache)
+    ground_pivots = _extract_pivots(_simplify(ground_truth, assignments),
+                                    assignments)
+    for pivot, possible_values in ground_pivots.items():
+      restrict(pivot, possible_values)
+
+    something_changed = True
+    while something_changed:
+      something_changed = False
+
+      and_terms = []
+      for var, var_implications in enumerate(implications):
+        or_terms = []
+        for value, implication in var_implications.items():
+          implication = _simplify(implication, assignments)
+          if implication is FALSE:
+            assignments[var] &= ~(1 << value)
+            del var_implications[value]
+            something_changed = True
+          elif implication is TRUE:
+            true_values[var] |= 1 << value
+            del var_implications[value]
+          else:
+            or_terms.append(implication)
+            var_implications[value] = implication
+        if assignments[var] & true_values[var]:
+          continue  # The disjunction is TRUE.
+        and_terms.append(_combine(_OR, or_terms))
+      d = _combine(_AND, and_terms)
+
+      for pivot, possible_values in _extract_pivots(d, assignments).items():
+        something_changed |= restrict(pivot, possible_values)
+
+    self.register_variable = utils.disabled_function
+    self.implies = utils.disabled_function
+
+    value_names = sorted(values, key=values.get)
+    self.assignments = {
+        name: {value_names[value] for value in _iter_bits(assignments[var])}
+        for var, name in enumerate(var_names)}
+    return self.assignments
@@ -30,6 +30,8 @@ FALSE = booleq.FALSE
 class TestBoolEq(unittest.TestCase):
   """Test algorithms and datastructures of booleq.py."""
 
+  SOLVER = booleq.Solver
+
   def testTrueAndFalse(self):
     self.assertNotEqual(TRUE, FALSE)
     self.assertNotEqual(FALSE, TRUE)
@@ -147,7 +149,7 @@ class TestBoolEq(unittest.TestCase):
     self.assertEquals(equation, equation.simplify(values))
 
   def _MakeSolver(self, variables=("x", "y")):
-    solver = booleq.Solver()
+    solver = self.SOLVER()
     for variable in variables:
       solver.register_variable(variable)
     return solver
@@ -246,7 +248,7 @@ class TestBoolEq(unittest.TestCase):
     self.assertRaises(AssertionError, solver.implies, Eq("x", "1"), TRUE)
 
   def testNested(self):
-    solver = booleq.Solver()
+    solver = self.SOLVER()
     solver.register_variable("x")
     solver.register_variable("y")
     solver.register_variable("z")
@@ -261,7 +263,7 @@ class TestBoolEq(unittest.TestCase):
     self.assertItemsEqual(m["z"], {"a", "b"})
 
   def testConjunction(self):
-    solver = booleq.Solver()
+    solver = self.SOLVER()
     solver.register_variable("x")
     solver.register_variable("y")
     solver.register_variable("y.T")
@@ -282,5 +284,12 @@ class TestBoolEq(unittest.TestCase):
     self.assertIn("1", m["y.T"])
     self.assertNotIn("4", m["y.T"])
 
+
+class TestBitsetSolver(TestBoolEq):
+  """Run the tests of TestBoolEq against booleq.BitsetSolver."""
+
+  SOLVER = booleq.BitsetSolver
+
+
 if __name__ == "__main__":
   unittest.main()
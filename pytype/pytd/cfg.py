@@ -37,27 +37,75 @@ class Program(object):
     entrypoint: Entrypoint of the program, if it has one. (None otherwise)
     cfg_nodes: CFG nodes in use. Will be used for assigning node IDs.
     variables: Variables in use. Will be used for assigning variable IDs.
+    reachability: A Reachability instance, for the CFG nodes.
+    solver: The Solver, if there is one. Its cached results are versioned by
+      "epochs", see HasChangedSince().
   """
 
   def __init__(self):
     """Initialize a new (initially empty) program."""
     self.entrypoint = None
     self.cfg_nodes = []
+    self.reachability = Reachability()
     self.next_variable_id = 0
     self.solver = None
     self.default_data = None
+    # For every finished epoch, the ids of the CFG nodes that changed in it.
+    self._changes = []
+    # The ids of the CFG nodes that changed in the current epoch.
+    self._pending_changes = set()
 
   def CreateSolver(self):
+    """Create a solver, or prepare the existing one for new queries."""
+    if self._pending_changes:
+      self._changes.append(tuple(self._pending_changes))
+      self._pending_changes = set()
     if self.solver is None:
       self.solver = Solver(self)
 
   def InvalidateSolver(self):
+    """Discard the solver and all its cached results."""
     self.solver = None
 
+  def InvalidateSolverAt(self, cfg_node):
+    """Discard cached results for queries that can see the given CFG node.
+
+    Call this when the edges into a node, or the bindings assigned at it,
+    change. The solver discards results for queries that were asked at this
+    node or at nodes reachable from it, the next time they're looked up.
+
+    Args:
+      cfg_node: The CFGNode that changed.
+    """
+    self._pending_changes.add(cfg_node.id)
+
+  @property
+  def epoch(self):
+    """The current epoch. Increases when a query follows a change."""
+    return len(self._changes)
+
+  def HasChangedSince(self, cfg_node, epoch):
+    """Whether something a query at cfg_node depends on changed since epoch.
+
+    The answer to a solver query at a CFG node only depends on the nodes it can
+    be reached from, and the bindings assigned at those.
+
+    Args:
+      cfg_node: A CFGNode.
+      epoch: An epoch, see the "epoch" property.
+
+    Returns:
+      True if there was a change to cfg_node or a node before it.
+    """
+    ancestors = self.reachability.ancestors[cfg_node.id]
+    return any(ancestors >> node_id & 1
+               for changes in self._changes[epoch:] for node_id in changes)
+
   def NewCFGNode(self, name=None, condition=None):
     """Start a new CFG node."""
-    self.InvalidateSolver()
-    cfg_node = CFGNode(self, name, len(self.cfg_nodes), condition)
+    # A new node isn't connected to anything yet, so this doesn't invalidate
+    # anything.
+    cfg_node = CFGNode(self, name, self.reachability.AddNode(), condition)
     self.cfg_nodes.append(cfg_node)
     return cfg_node
 
@@ -121,6 +169,47 @@ class Program(object):
       return v
 
 
+class Reachability(object):
+  """The transitive closure of the CFG, updated as nodes and edges are added.
+
+  For every CFG node, we store the nodes it can be reached from (including the
+  node itself) as a bitset indexed by node id. Since CFGs are mostly built by
+  appending new nodes, adding an edge typically only updates the bitset of the
+  new node. Edges to existing nodes (loops) also update their descendants.
+
+  Attributes:
+    ancestors: A list mapping a node id to the bitset of ids of the nodes that
+      can be reached going backwards from that node. Don't modify.
+  """
+
+  def __init__(self):
+    self.ancestors = []
+    self._outgoing = []  # node id -> set of node ids
+
+  def AddNode(self):
+    """Add a new, unconnected node, and return its id."""
+    node_id = len(self.ancestors)
+    self.ancestors.append(1 << node_id)
+    self._outgoing.append(set())
+    return node_id
+
+  def AddEdge(self, src_id, dst_id):
+    """Add an edge from node src_id to node dst_id."""
+    self._outgoing[src_id].add(dst_id)
+    bits = self.ancestors[src_id]
+    stack = [dst_id]
+    while stack:
+      node_id = stack.pop()
+      ancestors = self.ancestors[node_id]
+      if ancestors | bits != ancestors:
+        self.ancestors[node_id] = ancestors | bits
+        stack.extend(self._outgoing[node_id])
+
+  def IsReachable(self, src_id, dst_id):
+    """Whether node dst_id can be reached going backwards from node src_id."""
+    return bool(self.ancestors[src_id] >> dst_id & 1)
+
+
 class CFGNode(object):
   """A node in the CFG.
 
@@ -135,14 +224,12 @@ class CFGNode(object):
     incoming: Other CFGNodes that are connected to this node.
     outgoing: CFGNodes we connect to.
     bindings: Bindings that are being assigned to Variables at this CFGNode.
-    reachable_subset: A subset of the nodes reachable (going backwards) from
-      this one.
     condition: None if no condition is set at this node;
                The binding representing the condition which needs to be
                  fulfilled to take the branch represented by this node.
   """
   __slots__ = ("program", "id", "name", "incoming", "outgoing", "bindings",
-               "reachable_subset", "condition")
+               "condition")
 
   def __init__(self, program, name, cfgnode_id, condition):
     """Initialize a new CFG node. Called from Program.NewCFGNode."""
@@ -152,7 +239,6 @@ class CFGNode(object):
     self.incoming = set()
     self.outgoing = set()
     self.bindings = set()  # filled through RegisterBinding()
-    self.reachable_subset = {self}
     self.condition = condition
 
   def ConnectNew(self, name=None, condition=None):
@@ -163,25 +249,26 @@ class CFGNode(object):
 
   def ConnectTo(self, cfg_node):
     """Connect this node to an existing node."""
-    self.program.InvalidateSolver()
+    self.program.InvalidateSolverAt(cfg_node)
     self.outgoing.add(cfg_node)
     cfg_node.incoming.add(self)
-    cfg_node.reachable_subset |= self.reachable_subset
+    self.program.reachability.AddEdge(self.id, cfg_node.id)
 
   def CanHaveCombination(self, bindings):
-    """Quick version of HasCombination below."""
-    goals = set(bindings)
-    seen = set()
-    stack = [self]
+    """Quick version of HasCombination below.
+
+    Only checks that every binding is assigned somewhere before this node.
+
+    Arguments:
+      bindings: A list of Bindings.
+    Returns:
+      False if the combination is definitely not possible, True otherwise.
+    """
     # TODO(kramm): Take blocked nodes into account, like in Bindings()?
-    while stack and goals:
-      node = stack.pop()
-      if node in seen:
-        continue
-      seen.add(node)
-      goals -= goals & node.bindings
-      stack.extend(node.incoming)
-    return not goals
+    ancestors = self.program.reachability.ancestors[self.id]
+    return all(any(ancestors >> origin.where.id & 1
+                   for origin in binding.origins)
+               for binding in bindings)
 
   def HasCombination(self, bindings):
     """Query whether a combination is possible.
@@ -274,7 +361,7 @@ class Binding(object):
   originally retrieved from, before being assigned to something else here.
   Origins contain, through source_sets, "sources", which are other bindings.
   """
-  __slots__ = ("program", "variable", "origins", "data", "_cfgnode_to_origin")
+  __slots__ = ("program", "variable", "origins", "data")
 
   def __init__(self, program, variable, data):
     """Initialize a new Binding. Usually called through Variable.AddBinding."""
@@ -282,7 +369,6 @@ class Binding(object):
     self.variable = variable
     self.origins = []
     self.data = data
-    self._cfgnode_to_origin = {}
 
   def IsVisible(self, viewpoint):
     """Can we "see" this binding from the current cfg node?
@@ -303,23 +389,26 @@ class Binding(object):
     return self.program.solver.Solve({self}, viewpoint)
 
   def _FindOrAddOrigin(self, cfg_node):
-    try:
-      origin = self._cfgnode_to_origin[cfg_node]
-    except KeyError:
+    origin = self.FindOrigin(cfg_node)
+    if origin is None:
       origin = Origin(cfg_node)
       self.origins.append(origin)
-      self._cfgnode_to_origin[cfg_node] = origin
       self.variable.RegisterBindingAtNode(self, cfg_node)
       cfg_node.RegisterBinding(self)
     return origin
 
   def FindOrigin(self, cfg_node):
     """Return an Origin instance for a CFGNode, or None."""
-    return self._cfgnode_to_origin.get(cfg_node)
+    # Almost all bindings have only one or two origins, so a linear search is
+    # faster, and uses less memory, than maintaining a dictionary.
+    for origin in self.origins:
+      if origin.where is cfg_node:
+        return origin
+    return None
 
   def AddOrigin(self, where, source_set):
     """Add another possible origin to this binding."""
-    self.program.InvalidateSolver()
+    self.program.InvalidateSolverAt(where)
     origin = self._FindOrAddOrigin(where)
     origin.AddSourceSet(source_set)
 
@@ -372,8 +461,8 @@ class Variable(object):
     self.id = variable_id
     self.bindings = []
     self._data_id_to_binding = {}
-    self._cfgnode_to_bindings = collections.defaultdict(set)
-    self._callbacks = []
+    self._cfgnode_to_bindings = {}
+    self._callbacks = None  # created on demand, most variables have none
 
   def __repr__(self):
     return "<Variable v%d: %d choices>" % (
@@ -396,11 +485,12 @@ class Variable(object):
       A filtered list of bindings for this variable.
     """
     num_bindings = len(self.bindings)
-    if (viewpoint is None or
-        ((len(self._cfgnode_to_bindings) == 1 or num_bindings == 1) and
-         any(n in viewpoint.reachable_subset
-             for n in self._cfgnode_to_bindings))):
+    if viewpoint is None:
       return self.bindings
+    if len(self._cfgnode_to_bindings) == 1 or num_bindings == 1:
+      ancestors = self.program.reachability.ancestors[viewpoint.id]
+      if any(ancestors >> n.id & 1 for n in self._cfgnode_to_bindings):
+        return self.bindings
     result = set()
     seen = set()
     stack = [viewpoint]
@@ -409,10 +499,8 @@ class Variable(object):
         break
       node = stack.pop()
       seen.add(node)
-      # _cfgnode_to_bindings is a defaultdict, so don't use "get"
-      if node in self._cfgnode_to_bindings:
-        bindings = self._cfgnode_to_bindings[node]
-        assert bindings, "empty binding list"
+      bindings = self._cfgnode_to_bindings.get(node)
+      if bindings:
         result.update(bindings)
         # Don't expand this node - previous assignments to this variable will
         # be invisible, since they're overwritten here.
@@ -451,12 +539,14 @@ class Variable(object):
     try:
       binding = self._data_id_to_binding[id(data)]
     except KeyError:
-      self.program.InvalidateSolver()
+      # A new binding doesn't have any origins, so this doesn't invalidate
+      # anything. That only happens once we call AddOrigin().
       binding = Binding(self.program, self, data)
       self.bindings.append(binding)
       self._data_id_to_binding[id(data)] = binding
-      for callback in self._callbacks:
-        callback()
+      if self._callbacks:
+        for callback in self._callbacks:
+          callback()
       _variable_size_metric.add(len(self.bindings))
     return binding
 
@@ -517,9 +607,11 @@ class Variable(object):
     return new_variable
 
   def RegisterBindingAtNode(self, binding, node):
-    self._cfgnode_to_bindings[node].add(binding)
+    self._cfgnode_to_bindings.setdefault(node, set()).add(binding)
 
   def RegisterChangeListener(self, callback):
+    if self._callbacks is None:
+      self._callbacks = []
     self._callbacks.append(callback)
 
   def UnregisterChangeListener(self, callback):
@@ -657,10 +749,31 @@ class State(object):
 
 
 class _PathFinder(object):
-  """Finds a path between two nodes and collects nodes with conditions."""
+  """Finds a path between two nodes and collects nodes with conditions.
 
-  def __init__(self):
-    self._solved_find_queries = {}
+  Results are cached across changes to the program. A cached result for a
+  query starting at node n is reused until something before n changes.
+  """
+
+  def __init__(self, program):
+    self._program = program
+    self._reachability = program.reachability
+    self._solved_find_queries = {}  # query -> (epoch, result)
+    self._solved_path_queries = {}  # query -> (epoch, result)
+
+  def _Recall(self, cache, query):
+    """Look up a cached result for a query, or return None."""
+    entry = cache.get(query)
+    if entry is None:
+      return None
+    epoch, result = entry
+    current_epoch = self._program.epoch
+    if epoch != current_epoch:
+      if self._program.HasChangedSince(query[0], epoch):
+        return None
+      # Don't check the same epochs again next time.
+      cache[query] = current_epoch, result
+    return entry
 
   def _ResetState(self):
     """Prepare the working state for a new search."""
@@ -679,17 +792,28 @@ class _PathFinder(object):
 
   def FindPathToNode(self, start, finish, blocked):
     """Determine whether we can reach a node at all."""
-    stack = [start]
-    seen = set()
-    while stack:
-      node = stack.pop()
-      if node is finish:
-        return True
-      if node in seen or node in blocked:
-        continue
-      seen.add(node)
-      stack.extend(node.incoming)
-    return False
+    query = (start, finish, blocked)
+    entry = self._Recall(self._solved_path_queries, query)
+    if entry is not None:
+      return entry[1]
+    ancestors = self._reachability.ancestors
+    finish_bit = 1 << finish.id
+    result = False
+    if ancestors[start.id] & finish_bit:
+      stack = [start]
+      seen = set()
+      while stack:
+        node = stack.pop()
+        if node is finish:
+          result = True
+          break
+        if node in seen or node in blocked:
+          continue
+        seen.add(node)
+        # Only follow edges to nodes that have a path to finish at all.
+        stack.extend(n for n in node.incoming if ancestors[n.id] & finish_bit)
+    self._solved_path_queries[query] = self._program.epoch, result
+    return result
 
   def FindNodeBackwards(self, start, finish, blocked):
     """Determine whether we can reach a CFG node, going backwards.
@@ -712,21 +836,23 @@ class _PathFinder(object):
     """
     # Cache
     query = (start, finish, blocked)
-    if query in self._solved_find_queries:
-      return self._solved_find_queries[query]
+    entry = self._Recall(self._solved_find_queries, query)
+    if entry is not None:
+      return entry[1]
 
     # Special case start.
     if start is finish:
       return (True, [start] if start.condition else [])
 
-    # Run a quick DFS first, maybe we find a path that doesn't need a condition.
-    if not self.FindPathToNode(start, finish, blocked):
-      self._solved_find_queries[query] = False, None
-      return self._solved_find_queries[query]
-
-    self._ResetState()
-    result = self._FindNodeBackwardsImpl(start, finish, blocked)
-    self._solved_find_queries[query] = result
+    # Check the reachability index first. Blocked nodes can still cut off
+    # all paths, but we'll notice that during the search below, which only
+    # visits nodes that can reach finish.
+    if not self._reachability.IsReachable(start.id, finish.id):
+      result = False, None
+    else:
+      self._ResetState()
+      result = self._FindNodeBackwardsImpl(start, finish, blocked)
+    self._solved_find_queries[query] = self._program.epoch, result
     return result
 
   def _FindNodeBackwardsImpl(self, start, finish, blocked):
@@ -750,6 +876,8 @@ class _PathFinder(object):
     # Nodes which have already been added to a path.
     seen_set = set()
     node_to_iter = {}  # maps nodes to the iterator over their incoming links.
+    ancestors = self._reachability.ancestors
+    finish_bit = 1 << finish.id
     while path:
       head = path[-1]
       if head not in node_to_iter:
@@ -763,12 +891,15 @@ class _PathFinder(object):
           self._FinishNode(head, path)
         else:
           self._UpdateNodeToFinishSet(head, path)
-        continue
-      if next_node is finish:
         if self._solution_set is not None and not self._solution_set:
           # Solution set can never grow and is already empty.
           break
+        continue
+      if next_node is finish:
         self._FinishNode(next_node, path)
+        if not self._solution_set:
+          # Solution set can never grow and is already empty.
+          break
         continue
       if next_node in blocked:
         # The finish node is always blocked, therefore this needs to be below
@@ -777,6 +908,11 @@ class _PathFinder(object):
       if next_node in seen_set:
         continue
       seen_set.add(next_node)
+      if not ancestors[next_node.id] & finish_bit:
+        # There's no path to finish from here, so there's no need to explore
+        # the subgraph behind this node. Like for a node we did explore without
+        # finding a path, it won't have an entry in _node_to_finish_set.
+        continue
       path.append(next_node)
 
     if self._solution_set is not None:
@@ -837,7 +973,9 @@ class Solver(object):
   """The solver class is instantiated for a given "problem" instance.
 
   It maintains a cache of solutions for subproblems to be able to recall them if
-  they reoccur in the solving process.
+  they reoccur in the solving process. Since the solution for a state only
+  depends on the part of the CFG before the state's position, cached solutions
+  stay valid while the program grows elsewhere. See Program.HasChangedSince.
   """
 
   _cache_metric = metrics.MapCounter("cfg_solver_cache")
@@ -850,8 +988,8 @@ class Solver(object):
       program: The program we're in.
     """
     self.program = program
-    self._solved_states = {}
-    self._path_finder = _PathFinder()
+    self._solved_states = {}  # state -> (epoch, result)
+    self._path_finder = _PathFinder(program)
 
   def Solve(self, start_attrs, start_node):
     """Try to solve the given problem.
@@ -874,18 +1012,27 @@ class Solver(object):
 
   def _RecallOrFindSolution(self, state):
     """Memoized version of FindSolution()."""
-    if state in self._solved_states:
-      Solver._cache_metric.inc("hit")
-      return self._solved_states[state]
+    epoch = self.program.epoch
+    entry = self._solved_states.get(state)
+    if entry is not None:
+      solved_epoch, result = entry
+      if solved_epoch == epoch:
+        Solver._cache_metric.inc("hit")
+        return result
+      elif not self.program.HasChangedSince(state.pos, solved_epoch):
+        Solver._cache_metric.inc("hit")
+        self._solved_states[state] = epoch, result
+        return result
 
     # To prevent infinite loops, we insert this state into the hashmap as a
     # solvable state, even though we have not solved it yet. The reasoning is
     # that if it's possible to solve this state at this level of the tree, it
     # can also be solved in any of the children.
-    self._solved_states[state] = True
+    self._solved_states[state] = epoch, True
 
     Solver._cache_metric.inc("miss")
-    result = self._solved_states[state] = self._FindSolution(state)
+    result = self._FindSolution(state)
+    self._solved_states[state] = epoch, result
     return result
 
   def _IsSolvedBefore(self, where, goal, entrypoint, blocked):
@@ -910,7 +1057,6 @@ class Solver(object):
     """
     blocked = frozenset(blocked | {entrypoint})
     for origin in goal.origins:
-      # TODO(kramm): We don't cache this. Should we?
       if origin.where not in blocked and self._path_finder.FindPathToNode(
           where, origin.where, blocked):
         return True
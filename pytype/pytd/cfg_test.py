@@ -722,25 +722,116 @@ class CFGTest(unittest.TestCase):
 
   def testInvalidateSolver(self):
     p = cfg.Program()
-    x = p.NewVariable()
     n1 = p.NewCFGNode("n1")
     self.assertIsNone(p.solver)
     n1.HasCombination([])
-    self.assertIsNotNone(p.solver)
-    n2 = p.NewCFGNode("n2")
-    self.assertIsNone(p.solver)
-    n2.HasCombination([])
-    self.assertIsNotNone(p.solver)
-    x = p.NewVariable()  # a new variable by itself doesn't change the CFG
-    self.assertIsNotNone(p.solver)
-    a = x.AddBinding("a")
-    a.AddOrigin(n1, {})
-    self.assertIsNone(p.solver)
-    n2.HasCombination([a])
-    self.assertIsNotNone(p.solver)
-    x = p.NewVariable(["b"], [a], n2)
+    solver = p.solver
+    self.assertIsNotNone(solver)
+    p.NewCFGNode("n2")  # growing the CFG keeps the solver
+    self.assertIs(solver, p.solver)
+    p.InvalidateSolver()
     self.assertIsNone(p.solver)
 
+  def testSolverCacheSurvivesChanges(self):
+    p = cfg.Program()
+    x = p.NewVariable()
+    n1 = p.NewCFGNode("n1")
+    a = x.AddBinding("a", source_set=[], where=n1)
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    self.assertTrue(n3.HasCombination([a]))
+    # Overwriting x at n2 hides a from n3, but not from n1.
+    x.AddBinding("b", source_set=[], where=n2)
+    self.assertFalse(n3.HasCombination([a]))
+    self.assertTrue(n1.HasCombination([a]))
+    # A new path around n2 makes a visible again.
+    n1.ConnectTo(n3)
+    self.assertTrue(n3.HasCombination([a]))
+    # Changes after n3 don't affect queries at n3.
+    n4 = n3.ConnectNew("n4")
+    n5 = n4.ConnectNew("n5")
+    self.assertTrue(n5.HasCombination([a]))
+    x.AddBinding("c", source_set=[], where=n4)
+    self.assertFalse(n5.HasCombination([a]))
+    self.assertTrue(n3.HasCombination([a]))
+
+  def testHasChangedSince(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    p.CreateSolver()
+    epoch = p.epoch
+    n3 = n2.ConnectNew("n3")
+    p.CreateSolver()
+    self.assertFalse(p.HasChangedSince(n1, epoch))
+    self.assertFalse(p.HasChangedSince(n2, epoch))
+    self.assertTrue(p.HasChangedSince(n3, epoch))
+    self.assertFalse(p.HasChangedSince(n3, p.epoch))
+
+  def testReachability(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    n4 = n1.ConnectNew("n4")
+    r = p.reachability
+    self.assertTrue(r.IsReachable(n3.id, n1.id))
+    self.assertTrue(r.IsReachable(n3.id, n3.id))
+    self.assertFalse(r.IsReachable(n1.id, n3.id))
+    self.assertFalse(r.IsReachable(n4.id, n2.id))
+    # A loop back to n2 makes everything behind n2 reachable from n4, too.
+    n4.ConnectTo(n2)
+    self.assertTrue(r.IsReachable(n2.id, n4.id))
+    self.assertTrue(r.IsReachable(n3.id, n4.id))
+    self.assertFalse(r.IsReachable(n4.id, n3.id))
+
+  def testFindNodeBackwardsBlocked(self):
+    p = cfg.Program()
+    x = p.NewVariable()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2", x.AddBinding("a", source_set=[], where=n1))
+    n3 = n1.ConnectNew("n3")
+    n4 = n2.ConnectNew("n4")
+    n3.ConnectTo(n4)
+    finder = cfg._PathFinder(p)
+    self.assertEquals((True, []),
+                      finder.FindNodeBackwards(n4, n1, frozenset()))
+    self.assertEquals((True, [n2]),
+                      finder.FindNodeBackwards(n4, n1, frozenset([n3])))
+    self.assertEquals((False, None),
+                      finder.FindNodeBackwards(n4, n1, frozenset([n2, n3])))
+    self.assertEquals((False, None),
+                      finder.FindNodeBackwards(n1, n4, frozenset()))
+    self.assertTrue(finder.FindPathToNode(n4, n1, frozenset([n2])))
+    self.assertFalse(finder.FindPathToNode(n4, n1, frozenset([n2, n3])))
+
+  def testFindOrigin(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    x = p.NewVariable()
+    a = x.AddBinding("a", source_set=[], where=n1)
+    a.AddOrigin(n2, [])
+    a.AddOrigin(n1, [])
+    self.assertEquals(2, len(a.origins))
+    self.assertIs(n1, a.FindOrigin(n1).where)
+    self.assertIs(n2, a.FindOrigin(n2).where)
+    self.assertIsNone(a.FindOrigin(n3))
+
+  def testBindingsConnectedLater(self):
+    # n0 is connected to n1 after n1 -> n2 -> n3 was built.
+    p = cfg.Program()
+    n0 = p.NewCFGNode("n0")
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    n0.ConnectTo(n1)
+    x = p.NewVariable()
+    x.AddBinding("a", source_set=[], where=n0)
+    self.assertEquals(["a"], x.Data(n3))
+    self.assertEquals([], x.Data(p.NewCFGNode("n4")))
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -25,6 +25,7 @@
 
 import collections
 import logging
+import time
 
 from pytype.pytd import abc_hierarchy
 from pytype.pytd import booleq
@@ -543,13 +544,19 @@ class SimplifyUnionsWithSuperclasses(visitors.Visitor):
   def __init__(self, hierarchy):
     super(SimplifyUnionsWithSuperclasses, self).__init__()
     self.hierarchy = hierarchy
+    self._subclasses = {}
+
+  def _ExpandSubClasses(self, name):
+    if name not in self._subclasses:
+      self._subclasses[name] = self.hierarchy.ExpandSubClasses(name)
+    return self._subclasses[name]
 
   def VisitUnionType(self, union):
     c = collections.Counter()
     for t in set(union.type_list):
       # TODO(rechen): How can we make this work with GenericType?
       if isinstance(t, pytd.GENERIC_BASE_TYPE):
-        c += collections.Counter(self.hierarchy.ExpandSubClasses(str(t)))
+        c.update(self._ExpandSubClasses(str(t)))
     # Below, c[str[t]] can be zero - that's the default for non-existent items
     # in collections.Counter. It'll happen for types that are not
     # instances of GENERIC_BASE_TYPE, like container types.
@@ -1083,6 +1090,27 @@ class MergeTypeParameters(TypeParameterScope):
           visitors.ReplaceTypeParameters(substitutions)).Visit(SimplifyUnions())
 
 
+class _PassRunner(object):
+  """Runs the passes of Optimize() and records how long each of them takes."""
+
+  def __init__(self):
+    self._timings = []
+
+  def Run(self, name, f, *args):
+    start = time.clock()
+    result = f(*args)
+    self._timings.append((name, time.clock() - start))
+    return result
+
+  def Visit(self, node, visitor):
+    return self.Run(type(visitor).__name__, node.Visit, visitor)
+
+  def LogTimings(self):
+    if log.isEnabledFor(logging.INFO):
+      log.info("Optimize passes:\n%s", "\n".join(
+          "  %-40s %.4fs" % (name, elapsed) for name, elapsed in self._timings))
+
+
 def Optimize(node,
              builtins,
              lossy=False,
@@ -1112,35 +1140,37 @@ def Optimize(node,
   Returns:
     An optimized node.
   """
-  node = node.Visit(RemoveDuplicates())
-  node = node.Visit(SimplifyUnions())
-  node = node.Visit(CombineReturnsAndExceptions())
-  node = node.Visit(Factorize())
-  node = node.Visit(ApplyOptionalArguments())
-  node = node.Visit(CombineContainers())
-  node = node.Visit(SimplifyContainers())
-  superclasses = builtins.Visit(visitors.ExtractSuperClassesByName())
-  superclasses.update(node.Visit(
-      visitors.ExtractSuperClassesByName()))
+  passes = _PassRunner()
+  node = passes.Visit(node, RemoveDuplicates())
+  node = passes.Visit(node, SimplifyUnions())
+  node = passes.Visit(node, CombineReturnsAndExceptions())
+  node = passes.Visit(node, Factorize())
+  node = passes.Visit(node, ApplyOptionalArguments())
+  node = passes.Visit(node, CombineContainers())
+  node = passes.Visit(node, SimplifyContainers())
+  superclasses = passes.Run("ExtractSuperClassesByName (builtins)",
+                            builtins.Visit,
+                            visitors.ExtractSuperClassesByName())
+  superclasses.update(passes.Visit(
+      node, visitors.ExtractSuperClassesByName()))
   if use_abcs:
     superclasses.update(abc_hierarchy.GetSuperClasses())
   hierarchy = SuperClassHierarchy(superclasses)
-  node = node.Visit(SimplifyUnionsWithSuperclasses(hierarchy))
+  node = passes.Visit(node, SimplifyUnionsWithSuperclasses(hierarchy))
   if lossy:
-    node = node.Visit(
-        FindCommonSuperClasses(hierarchy)
-    )
+    node = passes.Visit(node, FindCommonSuperClasses(hierarchy))
   if max_union:
-    node = node.Visit(CollapseLongUnions(max_union))
-  node = node.Visit(AdjustReturnAndConstantGenericType())
+    node = passes.Visit(node, CollapseLongUnions(max_union))
+  node = passes.Visit(node, AdjustReturnAndConstantGenericType())
   if remove_mutable:
-    node = node.Visit(AbsorbMutableParameters())
-    node = node.Visit(CombineContainers())
-    node = node.Visit(MergeTypeParameters())
-    node = node.Visit(visitors.AdjustSelf(force=True))
-  node = node.Visit(SimplifyContainers())
+    node = passes.Visit(node, AbsorbMutableParameters())
+    node = passes.Visit(node, CombineContainers())
+    node = passes.Visit(node, MergeTypeParameters())
+    node = passes.Visit(node, visitors.AdjustSelf(force=True))
+  node = passes.Visit(node, SimplifyContainers())
   if can_do_lookup:
-    node = visitors.LookupClasses(node, builtins)
-    node = node.Visit(RemoveInheritedMethods())
-    node = node.Visit(RemoveRedundantSignatures(hierarchy))
+    node = passes.Run("LookupClasses", visitors.LookupClasses, node, builtins)
+    node = passes.Visit(node, RemoveInheritedMethods())
+    node = passes.Visit(node, RemoveRedundantSignatures(hierarchy))
+  passes.LogTimings()
   return node
@@ -38,24 +38,61 @@ def _FindStdlibFile(name, extension=".pytd"):
 # Keyed by the parameter(s) passed to GetBuiltinsPyTD:
 _cached_builtins_pytd = None  # ... => pytype.pytd.pytd.TypeDeclUnit
 
+# Written in front of precompiled builtins. Increase this if the format of the
+# file, or the pytd classes it pickles, change.
+_PRECOMPILED_VERSION = 1
 
-def Precompile(f):
-  """Write precompiled builtins to the specified file."""
-  data = GetBuiltinsAndTyping()
+
+def Precompile(f, modules=None):
+  """Write precompiled builtins to the specified file.
+
+  Args:
+    f: A file object, opened for writing in binary mode.
+    modules: Optional additional data to store, for other precompiled modules.
+      See load_pytd.Precompile.
+  """
+  data = GetBuiltinsAndTyping(), modules
   # Pickling builtins tends to bump up against the recursion limit.  Increase
   # it temporarily here.  If "RuntimeError: maximum recursion depth exceeded"
   # is seen during pickling, this limit may need to be increased further.
   old_limit = sys.getrecursionlimit()
   sys.setrecursionlimit(20000)
+  # The version is pickled separately, so that it can be checked before
+  # unpickling the rest of the file.
+  cPickle.dump(_PRECOMPILED_VERSION, f, protocol=2)
   cPickle.dump(data, f, protocol=2)
   sys.setrecursionlimit(old_limit)
 
 
 def LoadPrecompiled(f):
-  """Load precompiled builtins from the specified f."""
+  """Load precompiled builtins from the specified f.
+
+  Args:
+    f: A file object, opened for reading in binary mode.
+
+  Returns:
+    The additional data that was passed as "modules" to Precompile().
+
+  Raises:
+    ValueError: If the file was written by a different version of pytype.
+  """
   global _cached_builtins_pytd
   assert _cached_builtins_pytd is None
-  _cached_builtins_pytd = cPickle.load(f)
+  try:
+    version = cPickle.load(f)
+  except (EOFError, cPickle.UnpicklingError) as e:
+    raise ValueError("Couldn't read precompiled builtins: %s" %
+                     (str(e) or type(e).__name__))
+  if version != _PRECOMPILED_VERSION:
+    # Files written before the version was added start with the data itself.
+    if not isinstance(version, int):
+      version = "unknown"
+    raise ValueError(
+        "Precompiled builtins have version %s, but this pytype needs version "
+        "%d. Regenerate them with --generate-builtins." % (
+            version, _PRECOMPILED_VERSION))
+  _cached_builtins_pytd, modules = cPickle.load(f)
+  return modules
 
 
 def GetBuiltinsAndTyping():
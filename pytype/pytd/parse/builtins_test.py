@@ -1,5 +1,6 @@
 
 
+import cPickle
 import cStringIO
 
 from pytype.pytd import pytd
@@ -66,5 +67,21 @@ class UtilsTest(unittest.TestCase):
     self.assertEquals(pytd.Print(t1), pytd.Print(t2))
 
 
+  def testPrecompiledVersionMismatch(self):
+    precompiled = cStringIO.StringIO()
+    builtins.Precompile(precompiled)
+    data = precompiled.getvalue().replace(
+        cPickle.dumps(builtins._PRECOMPILED_VERSION, protocol=2),
+        cPickle.dumps(builtins._PRECOMPILED_VERSION + 1, protocol=2), 1)
+    old_builtins = builtins._cached_builtins_pytd
+    builtins._cached_builtins_pytd = None
+    try:
+      self.assertRaisesRegexp(ValueError, "Regenerate",
+                              builtins.LoadPrecompiled,
+                              cStringIO.StringIO(data))
+      self.assertIsNone(builtins._cached_builtins_pytd)
+    finally:
+      builtins._cached_builtins_pytd = old_builtins
+
 if __name__ == "__main__":
   unittest.main()
@@ -281,71 +281,163 @@ def _VisitNode(node, visitor, *args, **kwargs):
     The transformed Node (which *may* be the original node but could be a new
      node, even if the contents are the same).
   """
-  node_class = node.__class__
+  return _VisitChild(node, visitor, _GetWalkers(visitor), args, kwargs)
+
+
+# Map from a visitor class to a dictionary that maps node classes to walkers.
+# See _CompileWalker().
+_walkers = {}
+
+
+def _GetWalkers(visitor):
+  """Get the (lazily filled) dictionary of walkers for this visitor's class."""
+  visitor_class = visitor.__class__
+  walkers = _walkers.get(visitor_class)
+  if walkers is None:
+    walkers = _walkers[visitor_class] = {}
+  return walkers
+
+
+def _VisitChild(child, visitor, walkers, args, kwargs):
+  """Visit a node, tuple or leaf value, using the walker for its class."""
+  child_class = child.__class__
+  try:
+    walker = walkers[child_class]
+  except KeyError:
+    walker = walkers[child_class] = _CompileWalker(child_class, visitor)
+  return walker(child, visitor, walkers, args, kwargs)
+
+
+def _WalkLeaf(node, visitor, walkers, args, kwargs):
+  del visitor, walkers, args, kwargs  # unused
+  return node
+
+
+def _WalkTuple(node, visitor, walkers, args, kwargs):
+  new_children = None
+  for i, child in enumerate(node):
+    new_child = _VisitChild(child, visitor, walkers, args, kwargs)
+    if new_child is not child:
+      if new_children is None:
+        new_children = list(node)
+      new_children[i] = new_child
+  if new_children is None:
+    # Optimization: if we didn't change any of the children, keep the entire
+    # object the same.
+    return node
+  else:
+    # Since some of our children changed, instantiate a new node.
+    return tuple(new_children)
+
+
+def _WalkCustomNode(node, visitor, walkers, args, kwargs):
+  del walkers  # unused
+  # Node with an overloaded VisitNode() function. It'll do its own processing.
+  return node.VisitNode(visitor, *args, **kwargs)
+
+
+def _SubclassNames(cls):
+  """Returns the names of cls and all of its (transitive) subclasses."""
+  names = set()
+  todo = [cls]
+  while todo:
+    c = todo.pop()
+    names.add(c.__name__)
+    todo.extend(c.__subclasses__())
+  return names
+
+
+def _CanContain(allowed_types, visit_class_names):
+  """Can a field with the given allowed types contain a node we visit?"""
+  if allowed_types is None:
+    # Unchecked field. Anything can be in here.
+    return True
+  for allowed in allowed_types:
+    if isinstance(allowed, type):
+      if any(name in visit_class_names for name in _SubclassNames(allowed)):
+        return True
+    elif allowed in visit_class_names:
+      return True
+  return False
+
+
+def _CompileWalker(node_class, visitor):
+  """Create a function that visits instances of node_class with visitor.
+
+  The result only depends on the visitor's class, and is hence shared by all
+  visitors of that class. For nodes, we use the node's preconditions to only
+  descend into those fields which can contain a node that the visitor needs to
+  visit.
+
+  Args:
+    node_class: The class of the node (or tuple, or leaf value) to visit.
+    visitor: An instance of the visitor.
+  Returns:
+    A function (node, visitor, walkers, args, kwargs) -> new node.
+  """
   if node_class is tuple:
     # Exact comparison for tuple, because classes deriving from tuple
     # (like namedtuple) have different constructor arguments.
-    changed = False
-    new_children = []
-    for child in node:
-      new_child = _VisitNode(child, visitor, *args, **kwargs)
-      if new_child is not child:
-        changed = True
-      new_children.append(new_child)
-    if changed:
-      # Since some of our children changed, instantiate a new node.
-      return node_class(new_children)
-    else:
-      # Optimization: if we didn't change any of the children, keep the entire
-      # object the same.
-      return node
-  elif not isinstance(node, tuple):
-    return node
+    return _WalkTuple
+  elif not issubclass(node_class, tuple):
+    return _WalkLeaf
 
-  # At this point, assume node is a Node, which is a namedtuple.
-  if node.VisitNode.im_func != _VisitNode:
-    # Node with an overloaded VisitNode() function. It'll do its own processing.
-    return node.VisitNode(visitor, *args, **kwargs)
+  # At this point, assume node_class is a Node, which is a namedtuple.
+  if node_class.VisitNode.im_func is not _VisitNode:
+    return _WalkCustomNode
 
   node_class_name = node_class.__name__
-  if node_class_name not in visitor.visit_class_names:
-    return node
-
-  if node_class_name in visitor.enter_functions:
-    # The visitor wants to be informed that we're descending into this part
-    # of the tree.
-    status = visitor.Enter(node, *args, **kwargs)
-    # Don't descend if Enter<Node> explicitly returns False, but not None,
-    # since None is the default return of Python functions.
-    if status is False:
-      return node
-    # Any other value returned from Enter is ignored, so check:
-    assert status is None, repr((node_class_name, status))
-
-  changed = False
-  new_children = []
-  for child in node:
-    new_child = _VisitNode(child, visitor, *args, **kwargs)
-    if new_child is not child:
-      changed = True
-    new_children.append(new_child)
-  if changed:
-    # The constructor of namedtuple() differs from tuple(), so we have to
-    # pass the current tuple using "*".
-    if node_class_name in visitor.unchecked_node_names:
+  visit_class_names = visitor.visit_class_names
+  if node_class_name not in visit_class_names:
+    return _WalkLeaf
+
+  checker = node_class._CHECKER  # pylint: disable=protected-access
+  fields = [i for i, allowed_types in enumerate(checker.allowed_types_by_arg())
+            if _CanContain(allowed_types, visit_class_names)]
+  enter = node_class_name in visitor.enter_functions
+  visit = (visitor.visits_all_node_types or
+           node_class_name in visitor.visit_functions)
+  leave = node_class_name in visitor.leave_functions
+  unchecked = node_class_name in visitor.unchecked_node_names
+
+  def WalkNode(node, visitor, walkers, args, kwargs):
+    """Visit a node of class node_class."""
+    if enter:
+      # The visitor wants to be informed that we're descending into this part
+      # of the tree.
+      status = visitor.Enter(node, *args, **kwargs)
+      # Don't descend if Enter<Node> explicitly returns False, but not None,
+      # since None is the default return of Python functions.
+      if status is False:
+        return node
+      # Any other value returned from Enter is ignored, so check:
+      assert status is None, repr((node_class_name, status))
+
+    new_children = None
+    for i in fields:
+      child = node[i]
+      new_child = _VisitChild(child, visitor, walkers, args, kwargs)
+      if new_child is not child:
+        if new_children is None:
+          new_children = list(node)
+        new_children[i] = new_child
+    if new_children is None:
+      new_node = node
+    elif unchecked:
+      # The constructor of namedtuple() differs from tuple(), so we have to
+      # pass the current tuple using "*".
       new_node = _CreateUnchecked(node_class, *new_children)
     else:
       new_node = node_class(*new_children)
-  else:
-    new_node = node
-
-  visitor.old_node = node
-  # Now call the user supplied callback(s), if they exist.
-  if (visitor.visits_all_node_types or
-      node_class_name in visitor.visit_functions):
-    new_node = visitor.Visit(new_node, *args, **kwargs)
-  if node_class_name in visitor.leave_functions:
-    visitor.Leave(node, *args, **kwargs)
-
-  del visitor.old_node
-  return new_node
+
+    if visit or leave:
+      visitor.old_node = node
+      # Now call the user supplied callback(s), if they exist.
+      if visit:
+        new_node = visitor.Visit(new_node, *args, **kwargs)
+      if leave:
+        visitor.Leave(node, *args, **kwargs)
+      del visitor.old_node
+    return new_node
+
+  return WalkNode
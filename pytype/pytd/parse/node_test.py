@@ -14,6 +14,7 @@
 
 
 import itertools
+from pytype.pytd import pytd
 from pytype.pytd.parse import node
 from pytype.pytd.parse import visitors
 import unittest
@@ -97,6 +98,13 @@ class MultiNodeVisitor(visitors.Visitor):
     return X(*y)
 
 
+class NamedTypeVisitor(visitors.Visitor):
+  """A visitor that only transforms pytd.NamedType nodes."""
+
+  def VisitNamedType(self, t):
+    return pytd.NamedType(t.name.upper())
+
+
 class TestNode(unittest.TestCase):
   """Test the node.Node class generator."""
 
@@ -204,6 +212,25 @@ class TestNode(unittest.TestCase):
     new_n_expected = "X(NodeWithVisit(X(1, 2), Y(1, 2)), None)"
     self.assertEquals(repr(new_n), new_n_expected)
 
+  def testVisitPytdNodes(self):
+    """Test node.Node.Visit() for visitors that only visit some pytd nodes."""
+    t = pytd.UnionType((pytd.NamedType("foo"), pytd.AnythingType()))
+    alias = pytd.Alias("foo", pytd.GenericType(pytd.NamedType("bar"), (t,)))
+    self.assertEquals(
+        pytd.Alias("foo", pytd.GenericType(pytd.NamedType("BAR"), (
+            pytd.UnionType((pytd.NamedType("FOO"), pytd.AnythingType())),))),
+        alias.Visit(NamedTypeVisitor()))
+    constant = pytd.Constant("foo", pytd.AnythingType())
+    self.assertIs(constant, constant.Visit(NamedTypeVisitor()))
+
+  def testSkipNodesWithoutVisitedChildren(self):
+    visitor = NamedTypeVisitor()
+    self.assertIs(node._WalkLeaf,
+                  node._CompileWalker(pytd.AnythingType, visitor))
+    self.assertIs(node._WalkLeaf, node._CompileWalker(str, visitor))
+    self.assertIsNot(node._WalkLeaf,
+                     node._CompileWalker(pytd.UnionType, visitor))
+
   def testOrdering(self):
     nodes = [Node1(1, 1), Node1(1, 2),
              Node2(1, 1), Node2(2, 1),
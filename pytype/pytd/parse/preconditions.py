@@ -157,6 +157,15 @@ class CallChecker(object):
       allowed |= c.allowed_types()
     return allowed
 
+  def allowed_types_by_arg(self):
+    """Like allowed_types(), but for each argument separately.
+
+    Returns:
+      A list with one entry per argument, in order: Either a set of types and/or
+      typenames, or None if the argument isn't checked.
+    """
+    return [c.allowed_types() if c else None for _, c in self._arg_sequence]
+
 
 # RE to match a single token.  Leading whitepace is ignored.
 _TOKEN_RE = re.compile(
@@ -76,6 +76,11 @@ class CallCheckerTest(unittest.TestCase):
   def testAllowedTypes(self):
     self.assertEquals({"int", "str"}, self.checker.allowed_types())
 
+  def testAllowedTypesByArg(self):
+    self.assertEquals([{"int"}, {"str"}], self.checker.allowed_types_by_arg())
+    checker = preconditions.CallChecker([("x", None)])
+    self.assertEquals([None], checker.allowed_types_by_arg())
+
   def assertError(self, regex, *args, **kwargs):
     self.assertRaisesRegexp(
         preconditions.PreconditionError, regex, self.checker.check, *args,
@@ -772,6 +772,91 @@ class ClearClassTypePointers(Visitor):
     node.cls = None
 
 
+class InternNodes(Visitor):
+  """Replace structurally equal nodes by a single, shared instance.
+
+  Nodes are keyed on their class and the identity of their (already interned)
+  children, so interning a tree never hashes or compares whole subtrees. A
+  ClassType is only shared with ClassType nodes pointing to the same class.
+  ClassType nodes whose cls pointer is still None are left alone, since they
+  might be filled in differently later, and so are the nodes containing them.
+
+  Nodes that are shared this way must not be modified in place anymore. Since
+  nodes above an interned child are rebuilt, classes can be replaced by an
+  equal copy. ClassType nodes pointing to a replaced class are updated in place
+  to point to the new one, so resolved trees stay resolved.
+  """
+
+  visits_all_node_types = True
+
+  def __init__(self, table=None):
+    """Create this visitor.
+
+    Args:
+      table: A dictionary to store the shared nodes in. Pass the same dictionary
+        to share nodes across several trees.
+    """
+    super(InternNodes, self).__init__()
+    self._table = {} if table is None else table
+    # id of a replaced class -> (the class, its replacement)
+    self._replaced_classes = {}
+    # id of a class -> the ClassType nodes pointing to it we've seen so far
+    self._class_types = collections.defaultdict(list)
+
+  def _ReplaceClass(self, old, new):
+    """Point all the ClassType nodes we've seen at old to new instead."""
+    self._replaced_classes[id(old)] = (old, new)
+    for node in self._class_types.pop(id(old), ()):
+      key = (pytd.ClassType, node.name, id(old))
+      if self._table.get(key) is node:
+        del self._table[key]
+      node.cls = new
+      self._Intern(node)
+
+  def _Intern(self, value):
+    """Return the shared instance for a node or a tuple of nodes."""
+    if isinstance(value, pytd.ClassType):
+      if value.cls is None:
+        return value
+      if id(value.cls) in self._replaced_classes:
+        _, value.cls = self._replaced_classes[id(value.cls)]
+      key = (pytd.ClassType, value.name, id(value.cls))
+    elif isinstance(value, pytd.TypeDeclUnit):
+      # Modules compare by identity.
+      return value
+    else:
+      # Preconditions make sure that a given field of a given node class is
+      # either always a tuple / node, or never, so ids can't clash with values.
+      key = (value.__class__,) + tuple(
+          id(v) if isinstance(v, tuple) else v for v in value)
+    # The shared instance holds on to the children whose ids are in the key, so
+    # these ids stay valid for as long as the table entry exists.
+    shared = self._table.setdefault(key, value)
+    if isinstance(value, pytd.ClassType):
+      self._class_types[id(value.cls)].append(shared)
+    return shared
+
+  def _InternTuple(self, t):
+    new_t = tuple(self._InternTuple(v) if v.__class__ is tuple else v
+                  for v in t)
+    if all(new is old for new, old in zip(new_t, t)):
+      new_t = t
+    return self._Intern(new_t)
+
+  def Visit(self, node):
+    # Children that are nodes have been visited already, but tuples haven't.
+    if not isinstance(node, pytd.ClassType):
+      children = [self._InternTuple(v) if v.__class__ is tuple else v
+                  for v in node]
+      if any(new is not old for new, old in zip(children, node)):
+        node = node.__class__(*children)
+      node = self._Intern(node)
+      if isinstance(node, pytd.Class) and node is not self.old_node:
+        self._ReplaceClass(self.old_node, node)
+      return node
+    return self._Intern(node)
+
+
 class NamedTypeToClassType(Visitor):
   """Change all NamedType objects to ClassType objects.
   """
@@ -587,6 +587,63 @@ class TestVisitors(parser_test_base.ParserTest):
     self.assertMultiLineEqual(expected.strip(),
                               pytd.Print(self.ToAST(src)).strip())
 
+  def testInternNodes(self):
+    src = textwrap.dedent("""
+      def f(x: List[int], y: List[int]) -> Tuple[int, str]: ...
+      def g(x: Tuple[int, str]) -> int or str: ...
+    """)
+    tree = self.Parse(src).Visit(visitors.InternNodes())
+    (f,), (g,) = tree.Lookup("f").signatures, tree.Lookup("g").signatures
+    x, y = f.params
+    self.assertIs(x.type, y.type)
+    self.assertIs(f.return_type, g.params[0].type)
+    self.assertIs(f.return_type.parameters, g.params[0].type.parameters)
+    self.assertIs(x.type.parameters[0], g.return_type.type_list[0])
+    self.assertTrue(self.Parse(src).ASTeq(tree))
+
+  def testInternNodesAcrossTrees(self):
+    table = {}
+    t1 = pytd.GenericType(pytd.NamedType("list"), (pytd.NamedType("int"),))
+    t2 = pytd.GenericType(pytd.NamedType("list"), (pytd.NamedType("int"),))
+    self.assertIs(t1.Visit(visitors.InternNodes(table)),
+                  t2.Visit(visitors.InternNodes(table)))
+
+  def testInternClassTypes(self):
+    cls1 = pytd.Class("A", None, (), (), (), ())
+    cls2 = pytd.Class("A", None, (), (),
+                      (pytd.Constant("x", pytd.AnythingType()),), ())
+    table = {}
+    intern = lambda t: t.Visit(visitors.InternNodes(table))
+    self.assertIs(intern(pytd.ClassType("A", cls1)),
+                  intern(pytd.ClassType("A", cls1)))
+    self.assertIsNot(intern(pytd.ClassType("A", cls1)),
+                     intern(pytd.ClassType("A", cls2)))
+    # Unresolved ClassType nodes might still be filled in differently.
+    self.assertIsNot(intern(pytd.ClassType("A")), intern(pytd.ClassType("A")))
+
+  def testInternResolvedNodes(self):
+    src = textwrap.dedent("""
+        class object(object):
+            pass
+
+        def f() -> A
+
+        class A(object):
+            def a(self, x: A, y: A) -> A
+
+        def g() -> A
+    """)
+    tree = visitors.LookupClasses(self.Parse(src))
+    tree = tree.Visit(visitors.InternNodes())
+    a = tree.Lookup("A")
+    self.assertIs(a, tree.Lookup("f").signatures[0].return_type.cls)
+    self.assertIs(a, tree.Lookup("g").signatures[0].return_type.cls)
+    self_param, x, y = a.Lookup("a").signatures[0].params
+    self.assertIs(x.type, y.type)
+    self.assertIs(a, x.type.cls)
+    self.assertIs(a, self_param.type.cls)
+    tree.Visit(visitors.VerifyLookup())
+
 
 class TestAncestorMap(unittest.TestCase):
 
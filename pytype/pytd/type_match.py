@@ -30,6 +30,7 @@ import logging
 import re
 
 
+from pytype import metrics
 from pytype.pytd import abc_hierarchy
 from pytype.pytd import booleq
 from pytype.pytd import pytd
@@ -39,6 +40,8 @@ from pytype.pytd.parse import visitors
 
 log = logging.getLogger(__name__)
 
+_cache_metric = metrics.MapCounter("type_match_cache")
+
 
 ANON_PARAM = re.compile("_[0-9]+")
 
@@ -130,8 +133,13 @@ class TypeMatch(utils.TypeMatcher):
     """
     self.direct_subclasses = direct_subclasses or {}
     self.any_also_is_bottom = any_also_is_bottom
-    self.solver = booleq.Solver()
+    self.solver = booleq.BitsetSolver()
     self._implications = {}
+    # Caches keyed on ids. The values also hold the keys' objects, so that
+    # their ids can't be reused.
+    self._closed_types = {}
+    self._closed_implications = {}
+    self._methods_by_class = {}
 
   def default_match(self, t1, t2, *unused_args, **unused_kwargs):
     # Don't allow utils.TypeMatcher to do default matching.
@@ -282,12 +290,52 @@ class TypeMatch(utils.TypeMatcher):
     class_and_subclasses = self.get_subclasses(t)
     return [self.unclass(t) for t in class_and_subclasses]
 
+  def _is_closed(self, t):
+    """Whether t contains neither ~unknowns nor type parameters.
+
+    Matching two such types doesn't depend on subst and doesn't register any
+    solver variables, so the result only depends on the two types.
+
+    Args:
+      t: A pytd.TYPE.
+    Returns:
+      True if t is closed.
+    """
+    entry = self._closed_types.get(id(t))
+    if entry is None:
+      if isinstance(t, (pytd.AnythingType, pytd.NothingType)):
+        closed = True
+      elif isinstance(t, (pytd.NamedType, pytd.ClassType, StrictType)):
+        closed = not is_unknown(t)
+      elif isinstance(t, pytd.UnionType):
+        closed = all(self._is_closed(u) for u in t.type_list)
+      elif isinstance(t, pytd.GenericType):
+        closed = self._is_closed(t.base_type) and all(
+            self._is_closed(p) for p in t.parameters)
+      else:
+        closed = False
+      entry = self._closed_types[id(t)] = (t, closed)
+    return entry[1]
+
   def match_type_against_type(self, t1, t2, subst):
-    types = (t1, t2, frozenset(subst.items()))
+    if self._is_closed(t1) and self._is_closed(t2):
+      ids = (id(t1), id(t2))
+      if ids in self._closed_implications:
+        _cache_metric.inc("hit")
+        return self._closed_implications[ids]
+      types = (t1, t2)
+    else:
+      ids = None
+      types = (t1, t2, frozenset(subst.items()))
     if types in self._implications:
-      return self._implications[types]
-    implication = self._implications[types] = self._match_type_against_type(
-        t1, t2, subst)
+      _cache_metric.inc("hit")
+      implication = self._implications[types]
+    else:
+      _cache_metric.inc("miss")
+      implication = self._implications[types] = self._match_type_against_type(
+          t1, t2, subst)
+    if ids:
+      self._closed_implications[ids] = implication
     return implication
 
   def _full_name(self, t):
@@ -439,9 +487,10 @@ class TypeMatch(utils.TypeMatcher):
         for s1 in f1.signatures)
 
   def match_Function_against_Class(self, f1, cls2, subst, cache):
-    cls2_methods = cache.get(id(cls2))
-    if cls2_methods is None:
-      cls2_methods = cache[id(cls2)] = {f.name: f for f in cls2.methods}
+    entry = cache.get(id(cls2))
+    if entry is None:
+      entry = cache[id(cls2)] = (cls2, {f.name: f for f in cls2.methods})
+    cls2_methods = entry[1]
     if f1.name not in cls2_methods:
       # The class itself doesn't have this method, but base classes might.
       # TODO(kramm): This should do MRO order, not depth-first.
@@ -484,9 +533,9 @@ class TypeMatch(utils.TypeMatcher):
   def match_Class_against_Class(self, cls1, cls2, subst):  # pylint: disable=invalid-name
     """Match a pytd.Class against another pytd.Class."""
     implications = []
-    cache = {}
     for f1 in cls1.methods:
-      implication = self.match_Function_against_Class(f1, cls2, subst, cache)
+      implication = self.match_Function_against_Class(
+          f1, cls2, subst, self._methods_by_class)
       implications.append(implication)
       if implication is booleq.FALSE:
         break
@@ -104,6 +104,21 @@ class TestTypeMatch(parser_test_base.ParserTest):
     eq = m.match_type_against_type(pytd.NamedType("A"), pytd.NamedType("B"), {})
     self.assertNotEquals(eq, booleq.TRUE)
 
+  def testCacheClosedTypes(self):
+    m = type_match.TypeMatch({})
+    a, b = pytd.NamedType("A"), pytd.NamedType("B")
+    t = pytd.TypeParameter("T", "Foo")
+    eq1 = m.match_type_against_type(a, b, {})
+    eq2 = m.match_type_against_type(a, b, {t: a})
+    self.assertIs(eq1, eq2)
+
+  def testCacheTypeParameters(self):
+    m = type_match.TypeMatch({})
+    a, b = pytd.NamedType("A"), pytd.NamedType("B")
+    t = pytd.TypeParameter("T", "Foo")
+    self.assertEquals(m.match_type_against_type(t, a, {t: a}), booleq.TRUE)
+    self.assertEquals(m.match_type_against_type(t, a, {t: b}), booleq.FALSE)
+
   def testNamedAgainstGeneric(self):
     m = type_match.TypeMatch({})
     eq = m.match_type_against_type(pytd.GenericType(pytd.NamedType("A"), ()),
@@ -59,6 +59,31 @@ class Typeshed(object):
     """
     return self._typeshed_path
 
+  def _get_version_dirs(self, version):
+    versions = ["%d.%d" % (version[0], minor)
+                for minor in range(version[1], -1, -1)]
+    # E.g. for Python 3.5, try 3.5/, 3.4/, 3.3/, ..., 3.0/, 3/, 2and3.
+    # E.g. for Python 2.7, try 2.7/, 2.6/, ..., 2/, 2and3.
+    # The order is the same as that of mypy. See default_lib_path in
+    # https://github.com/JukkaL/mypy/blob/master/mypy/build.py#L249
+    return versions + [str(version[0]), "2and3"]
+
+  def get_all_module_names(self, toplevel, version):
+    """Get the names of all modules in a typeshed directory.
+
+    Arguments:
+      toplevel: the top-level directory within typeshed/, typically "stdlib".
+      version: The Python version. (major, minor)
+
+    Returns:
+      A set of module names, e.g. {"os", "os.path"}.
+    """
+    names = set()
+    for v in self._get_version_dirs(version):
+      names |= utils.find_module_names(
+          os.path.join(self._typeshed_path, toplevel, v), ".pyi")
+    return names
+
   def get_module_file(self, toplevel, module, version):
     """Get the contents of a typeshed file, typically with a file name *.pyi.
 
@@ -75,13 +100,7 @@ class Typeshed(object):
       IOError: if file not found
     """
     module_path = os.path.join(*module.split("."))
-    versions = ["%d.%d" % (version[0], minor)
-                for minor in range(version[1], -1, -1)]
-    # E.g. for Python 3.5, try 3.5/, 3.4/, 3.3/, ..., 3.0/, 3/, 2and3.
-    # E.g. for Python 2.7, try 2.7/, 2.6/, ..., 2/, 2and3.
-    # The order is the same as that of mypy. See default_lib_path in
-    # https://github.com/JukkaL/mypy/blob/master/mypy/build.py#L249
-    for v in versions + [str(version[0]), "2and3"]:
+    for v in self._get_version_dirs(version):
       path_rel = os.path.join(toplevel, v, module_path)
 
       # Give precedence to missing.txt
@@ -102,6 +121,36 @@ class Typeshed(object):
 _typeshed = None
 
 
+def _get_typeshed():
+  global _typeshed
+  if _typeshed is None:
+    _typeshed = Typeshed()
+  return _typeshed
+
+
+def get_all_module_names(pyi_subdir, python_version):
+  """Get the names of all modules in a typeshed directory, like "stdlib"."""
+  return _get_typeshed().get_all_module_names(pyi_subdir, python_version)
+
+
+def get_type_definition_file(pyi_subdir, module, python_version):
+  """Find a *.pyi in typeshed.
+
+  Args:
+    pyi_subdir: the directory where the module should be found
+    module: the module name (without any file extension)
+    python_version: sys.version_info[:2]
+
+  Returns:
+    A tuple with the filename and contents of the file; None if the module
+    doesn't have a definition.
+  """
+  try:
+    return _get_typeshed().get_module_file(pyi_subdir, module, python_version)
+  except IOError:
+    return None
+
+
 def parse_type_definition(pyi_subdir, module, python_version):
   """Load and parse a *.pyi from typeshed.
 
@@ -113,15 +162,9 @@ def parse_type_definition(pyi_subdir, module, python_version):
   Returns:
     The AST of the module; None if the module doesn't have a definition.
   """
-  global _typeshed
-  if _typeshed is None:
-    _typeshed = Typeshed()
-
-  try:
-    filename, src = _typeshed.get_module_file(pyi_subdir,
-                                              module,
-                                              python_version)
-  except IOError:
+  found = get_type_definition_file(pyi_subdir, module, python_version)
+  if found is None:
     return None
+  filename, src = found
   return builtins.ParsePyTD(src, filename=filename, module=module,
                             python_version=python_version).Replace(name=module)
@@ -15,38 +15,66 @@ UNSATISFIABLE = object()
 
 
 class FrameState(object):
-  """Immutable state object, for attaching to opcodes."""
+  """State object, for attaching to opcodes.
 
-  __slots__ = ["block_stack", "data_stack", "node", "exception", "why"]
+  States come in two flavors. Snapshots (the default) are immutable, and are
+  what we store in Frame.states, where multiple paths through the code merge.
+  Methods that change a snapshot return a mutable copy of it, whose data stack
+  is a list. Further changes to a mutable state are done in place, and return
+  the same state. So within a basic block, we only copy the stack once.
 
-  def __init__(self, data_stack, block_stack, node, exception, why):
+  This means that if you want to keep a state around while also creating a
+  modified version of it (e.g., to store it as the state at a jump target),
+  you need to call snapshot() first.
+  """
+
+  __slots__ = ["block_stack", "data_stack", "node", "exception", "why",
+               "_mutable"]
+
+  def __init__(self, data_stack, block_stack, node, exception, why,
+               mutable=False):
     self.data_stack = data_stack
     self.block_stack = block_stack
     self.node = node
     self.exception = exception
     self.why = why
+    self._mutable = mutable
 
   @classmethod
   def init(cls, node):
     return FrameState((), (), node, None, None)
 
-  def __setattribute__(self):
-    raise AttributeError("States are immutable.")
-
-  def set_why(self, why):
-    return FrameState(self.data_stack,
+  def snapshot(self):
+    """Return an immutable version of this state."""
+    if not self._mutable:
+      return self
+    return FrameState(tuple(self.data_stack),
                       self.block_stack,
                       self.node,
                       self.exception,
-                      why)
+                      self.why)
 
-  def push(self, *values):
-    """Push value(s) onto the value stack."""
-    return FrameState(self.data_stack + tuple(values),
+  def _writable(self):
+    """Return a state we're allowed to modify: Either self or a copy."""
+    if self._mutable:
+      return self
+    return FrameState(list(self.data_stack),
                       self.block_stack,
                       self.node,
                       self.exception,
-                      self.why)
+                      self.why,
+                      mutable=True)
+
+  def set_why(self, why):
+    state = self._writable()
+    state.why = why
+    return state
+
+  def push(self, *values):
+    """Push value(s) onto the value stack."""
+    state = self._writable()
+    state.data_stack.extend(values)
+    return state
 
   def peek(self, n):
     """Get a value `n` entries down in the stack, without changing the stack."""
@@ -57,26 +85,20 @@ class FrameState(object):
 
   def topn(self, n):
     if n > 0:
-      return self.data_stack[-n:]
+      return tuple(self.data_stack[-n:])
     else:
       return ()
 
   def pop(self):
     """Pop a value from the value stack."""
-    value = self.data_stack[-1]
-    return FrameState(self.data_stack[:-1],
-                      self.block_stack,
-                      self.node,
-                      self.exception,
-                      self.why), value
+    state = self._writable()
+    return state, state.data_stack.pop()
 
   def pop_and_discard(self):
     """Pop a value from the value stack and discard it."""
-    return FrameState(self.data_stack[:-1],
-                      self.block_stack,
-                      self.node,
-                      self.exception,
-                      self.why)
+    state = self._writable()
+    del state.data_stack[-1:]
+    return state
 
   def popn(self, n):
     """Return n values, ordered oldest-to-newest."""
@@ -86,39 +108,31 @@ class FrameState(object):
     if len(self.data_stack) < n:
       raise IndexError("Trying to pop %d values from stack of size %d" %
                        (n, len(self.data_stack)))
-    values = self.data_stack[-n:]
-    return FrameState(self.data_stack[:-n],
-                      self.block_stack,
-                      self.node,
-                      self.exception,
-                      self.why), values
+    state = self._writable()
+    values = tuple(state.data_stack[-n:])
+    del state.data_stack[-n:]
+    return state, values
 
   def push_block(self, block):
     """Push a block on to the block stack."""
-    return FrameState(self.data_stack,
-                      self.block_stack + (block,),
-                      self.node,
-                      self.exception,
-                      self.why)
+    state = self._writable()
+    state.block_stack += (block,)
+    return state
 
   def pop_block(self):
     """Pop a block from the block stack."""
     block = self.block_stack[-1]
-    return FrameState(self.data_stack,
-                      self.block_stack[:-1],
-                      self.node,
-                      self.exception,
-                      self.why), block
+    state = self._writable()
+    state.block_stack = state.block_stack[:-1]
+    return state, block
 
   def change_cfg_node(self, node):
     assert isinstance(node, cfg.CFGNode)
     if self.node is node:
       return self
-    return FrameState(self.data_stack,
-                      self.block_stack,
-                      node,
-                      self.exception,
-                      self.why)
+    state = self._writable()
+    state.node = node
+    return state
 
   def connect_to_cfg_node(self, node):
     self.node.ConnectTo(node)
@@ -132,16 +146,16 @@ class FrameState(object):
         for this node to be reached.
 
     Returns:
-      A new state which is the same as this state except for the node, which is
+      A state which is the same as this state except for the node, which is
       the new one.
     """
     new_node = self.node.ConnectNew(self.node.name, condition)
     return self.change_cfg_node(new_node)
 
   def merge_into(self, other):
-    """Merge with another state."""
+    """Merge with another state. Returns an immutable state."""
     if other is None:
-      return self
+      return self.snapshot()
     assert len(self.data_stack) == len(other.data_stack)
     assert len(self.block_stack) == len(other.block_stack)
     node = other.node
@@ -149,7 +163,7 @@ class FrameState(object):
       self.node.ConnectTo(node)
     both = zip(self.data_stack, other.data_stack)
     if all(v1 is v2 for v1, v2 in both):
-      data_stack = self.data_stack
+      data_stack = tuple(self.data_stack)
     else:
       data_stack = tuple(
           self.node.program.MergeVariables(node, [v1, v2])
@@ -161,14 +175,14 @@ class FrameState(object):
                         other.node,
                         self.exception,
                         self.why)
-    return self
+    return self.snapshot()
 
   def set_exception(self, exc_type, value, tb):
-    return FrameState(self.data_stack,
-                      self.block_stack,
-                      self.node.ConnectNew(self.node.name),
-                      (exc_type, value, tb),
-                      self.why)
+    node = self.node.ConnectNew(self.node.name)
+    state = self._writable()
+    state.node = node
+    state.exception = (exc_type, value, tb)
+    return state
 
 
 class Frame(object):
@@ -37,6 +37,45 @@ ONLY_FALSE = FakeValue("F", False, True)
 AMBIGUOUS = FakeValue("?", True, True)
 
 
+class FrameStateTest(unittest.TestCase):
+  """Test FrameState."""
+
+  def setUp(self):
+    self._program = cfg.Program()
+    self._node = self._program.NewCFGNode("test")
+
+  def test_snapshot_is_copied_on_write(self):
+    s1 = state.FrameState.init(self._node).push(1, 2)
+    snapshot = s1.snapshot()
+    s2, value = snapshot.pop()
+    self.assertEquals(2, value)
+    self.assertIsNot(snapshot, s2)
+    self.assertEquals((1, 2), snapshot.data_stack)
+    self.assertEquals([1], s2.data_stack)
+
+  def test_mutable_state_changes_in_place(self):
+    s1 = state.FrameState.init(self._node).push(1)
+    s2 = s1.push(2).push_block("block").set_why("why")
+    self.assertIs(s1, s2)
+    s3, values = s2.popn(2)
+    self.assertIs(s1, s3)
+    self.assertEquals((1, 2), values)
+    self.assertEquals(("block",), s3.block_stack)
+    self.assertEquals("why", s3.why)
+
+  def test_merge_into_returns_snapshot(self):
+    s1 = state.FrameState.init(self._node).push(1)
+    merged = s1.merge_into(None)
+    s1.push(2)
+    self.assertEquals((1,), merged.data_stack)
+    self.assertIsNot(merged, merged.push(3))
+
+  def test_topn(self):
+    s = state.FrameState.init(self._node).push(1, 2, 3)
+    self.assertEquals((2, 3), s.topn(2))
+    self.assertEquals((), s.topn(0))
+
+
 class ConditionTestBase(unittest.TestCase):
 
   def setUp(self):
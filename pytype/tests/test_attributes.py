@@ -209,6 +209,42 @@ class TestAttributes(test_inference.InferenceTest):
       x = ...  # type: int
     """)
 
+  def testOverrideAfterLookup(self):
+    ty = self.Infer("""
+      class A(object):
+        def foo(self):
+          return 42
+      class B(A):
+        pass
+      x = B().foo()
+      B.foo = lambda self: "hello world"
+      y = B().foo()
+    """, deep=True, solve_unknowns=True)
+    self.assertTypesMatchPytd(ty, """
+      class A(object):
+        def foo(self) -> int
+      class B(A):
+        def foo(self) -> str
+      x = ...  # type: int
+      y = ...  # type: str
+    """)
+
+  def testOverrideBuiltinAfterLookup(self):
+    ty = self.Infer("""
+      class A(dict):
+        pass
+      x = A().keys()
+      A.keys = lambda self: 42
+      y = A().keys()
+    """, deep=True, solve_unknowns=True)
+    self.assertTypesMatchPytd(ty, """
+      from typing import List
+      class A(dict):
+        def keys(self) -> int
+      x = ...  # type: List[nothing]
+      y = ...  # type: int
+    """)
+
   @unittest.skip("Magic methods aren't computed")
   def testCallComputed(self):
     ty = self.Infer("""
@@ -0,0 +1,135 @@
+"""Tests for --call-summaries."""
+
+from pytype.tests import test_inference
+
+
+class CallSummariesTest(test_inference.InferenceTest):
+  """Tests for --call-summaries."""
+
+  def setUp(self):
+    super(CallSummariesTest, self).setUp()
+    self.options.tweak(call_summaries=True)
+
+  def testSameTypes(self):
+    ty = self.Infer("""
+      class A(object):
+        pass
+      def f(x):
+        return [x]
+      def g():
+        return f(A())
+      def h():
+        return f(A())
+    """, deep=True)
+    self.assertTypesMatchPytd(ty, """
+      from typing import List
+      class A(object):
+        pass
+      def f(x) -> list
+      def g() -> List[A]
+      def h() -> List[A]
+    """)
+
+  def testDifferentTypes(self):
+    ty = self.Infer("""
+      def f(x):
+        return [x]
+      a = f(1)
+      b = f("")
+    """, deep=False)
+    self.assertTypesMatchPytd(ty, """
+      from typing import List
+      a = ...  # type: List[int]
+      b = ...  # type: List[str]
+      def f(x: int) -> List[int]
+      def f(x: str) -> List[str]
+    """)
+
+  def testMaximumDepth(self):
+    # Without summaries, h() would be inferred as returning Any, since the call
+    # to f() is beyond the maximum depth.
+    ty = self.Infer("""
+      def f(x):
+        return [x]
+      def g(x):
+        return f(x)
+      def h():
+        return g(3)
+      f(3)
+    """, deep=True, maximum_depth=2)
+    self.assertTypesMatchPytd(ty, """
+      from typing import List
+      def f(x) -> list
+      def g(x) -> list
+      def h() -> List[int]
+    """)
+
+  def testMutatedArgument(self):
+    ty = self.Infer("""
+      class A(object):
+        pass
+      def set_x(a, v):
+        a.x = v
+      def f():
+        a = A()
+        set_x(a, 1)
+        return a.x
+      def g():
+        b = A()
+        set_x(b, 2)
+        return b.x
+    """, deep=True)
+    self.assertTypesMatchPytd(ty, """
+      class A(object):
+        x = ...  # type: int
+      def set_x(a, v) -> None
+      def f() -> int
+      def g() -> int
+    """)
+
+  def testDifferentFunctions(self):
+    ty = self.Infer("""
+      def to_int(x):
+        return 42
+      def to_str(x):
+        return "hello"
+      def apply(f, x):
+        return f(x)
+      a = apply(to_int, 1)
+      b = apply(to_str, 1)
+    """, deep=False)
+    self.assertTypesMatchPytd(ty, """
+      from typing import Callable
+      a = ...  # type: int
+      b = ...  # type: str
+      def to_int(x: int) -> int
+      def to_str(x: int) -> str
+      def apply(f: Callable, x: int) -> int or str
+    """)
+
+  def testDifferentClasses(self):
+    ty = self.Infer("""
+      class A(object):
+        pass
+      class B(object):
+        pass
+      def make(c):
+        return c()
+      a = make(A)
+      b = make(B)
+    """, deep=False)
+    self.assertTypesMatchPytd(ty, """
+      from typing import Type
+      a = ...  # type: A
+      b = ...  # type: B
+      class A(object):
+        pass
+      class B(object):
+        pass
+      def make(c: Type[A]) -> A
+      def make(c: Type[B]) -> B
+    """)
+
+
+if __name__ == "__main__":
+  test_inference.main()
@@ -88,7 +88,8 @@ class ComplexityLimit(object):
       raise TooComplexError()
 
 
-def deep_variable_product(variables, limit=DEEP_VARIABLE_LIMIT):
+def deep_variable_product(variables, limit=DEEP_VARIABLE_LIMIT,
+                          value_filter=None):
   """Take the deep Cartesian product of a list of Variables.
 
   For example:
@@ -106,6 +107,9 @@ def deep_variable_product(variables, limit=DEEP_VARIABLE_LIMIT):
   Args:
     variables: A sequence of Variables.
     limit: How many results we allow before aborting.
+    value_filter: Optionally, a function that takes a Value and returns whether
+      it can be used. Rows containing Values that can't be used are pruned
+      while the product is built, and don't count towards the limit.
 
   Returns:
     A list of lists of Values, where each sublist has one Value from each
@@ -115,19 +119,26 @@ def deep_variable_product(variables, limit=DEEP_VARIABLE_LIMIT):
     TooComplexError: If we expanded too many values.
   """
   return _deep_values_list_product((v.bindings for v in variables), (),
-                                   ComplexityLimit(limit))
+                                   ComplexityLimit(limit), value_filter)
 
 
-def _deep_values_list_product(values_list, seen, complexity_limit):
+def _deep_values_list_product(values_list, seen, complexity_limit,
+                              value_filter=None):
   """Take the deep Cartesian product of a list of list of Values."""
+  values_list = [values for values in values_list if values]
+  if value_filter:
+    values_list = [[value for value in values if value_filter(value)]
+                   for values in values_list]
+    if not all(values_list):
+      # One of the lists has no usable values, so there's no valid row.
+      return []
   result = []
-  for row in itertools.product(*(values for values in values_list if values)):
+  for row in itertools.product(*values_list):
     extra_params = sum([entry.data.unique_parameter_values()
                         for entry in row if entry not in seen], [])
-    extra_values = (extra_params and
-                    _deep_values_list_product(extra_params, seen + row,
-                                              complexity_limit))
-    if extra_values:
+    if extra_params:
+      extra_values = _deep_values_list_product(extra_params, seen + row,
+                                               complexity_limit, value_filter)
       for new_row in extra_values:
         result.append(row + new_row)
     else:
@@ -432,6 +443,30 @@ def load_pytype_file(filename):
     return fi.read()
 
 
+def find_module_names(path, extension):
+  """Get the names of all modules in a directory tree.
+
+  Arguments:
+    path: the root directory. Doesn't need to exist.
+    extension: the extension of module files, e.g. ".pyi"
+  Returns:
+    A set of module names. E.g. {"os", "os.path", "xml"} for the files os.pyi,
+    os/path.pyi and xml/__init__.pyi.
+  """
+  names = set()
+  for dirpath, _, files in os.walk(path):
+    for filename in files:
+      base, ext = os.path.splitext(filename)
+      if ext != extension:
+        continue
+      parts = os.path.relpath(os.path.join(dirpath, base), path).split(os.sep)
+      if parts[-1] == "__init__":
+        parts.pop()
+      if parts:
+        names.add(".".join(parts))
+  return names
+
+
 def list_startswith(l, prefix):
   """Like str.startswith, but for lists."""
   return l[:len(prefix)] == prefix
@@ -174,6 +174,32 @@ class UtilsTest(unittest.TestCase):
         {x2, x6},
     ])
 
+  def testDeepVariableProductWithFilter(self):
+    x1, x2, x3, x4, x5, x6 = [DummyValue(i + 1) for i in range(6)]
+    v1 = self.prog.NewVariable([x1, x2, x3], [], self.current_location)
+    v2 = self.prog.NewVariable([x4, x5], [], self.current_location)
+    v3 = self.prog.NewVariable([x6], [], self.current_location)
+    x1.set_parameters([v2])
+    x2.set_parameters([v3])
+    product = utils.deep_variable_product(
+        [v1], value_filter=lambda value: value.data not in (x4, x6))
+    rows = [{a.data for a in row}
+            for row in product]
+    self.assertItemsEqual(rows, [
+        {x1, x5},
+        {x3},
+    ])
+
+  def testDeepVariableProductFilterLimit(self):
+    values = [DummyValue(i + 1) for i in range(4)]
+    variables = [self.prog.NewVariable(values, [], self.current_location)
+                 for _ in range(4)]
+    self.assertRaises(utils.TooComplexError,
+                      utils.deep_variable_product, variables, 16)
+    product = utils.deep_variable_product(
+        variables, 16, value_filter=lambda value: value.data is values[0])
+    self.assertEquals(1, len(product))
+
   def testVariableProductDict(self):
     u1 = self.prog.NewVariable([1, 2], [], self.current_location)
     u2 = self.prog.NewVariable([3, 4], [], self.current_location)
@@ -39,6 +39,7 @@ from pytype.pyc import opcodes
 from pytype.pyc import pyc
 from pytype.pyi import parser
 from pytype.pytd import cfg as typegraph
+from pytype.pytd import pytd
 from pytype.pytd import slots
 from pytype.pytd import utils as pytd_utils
 from pytype.pytd.parse import builtins
@@ -60,12 +61,45 @@ repper = repr_obj.repr
 Block = collections.namedtuple("Block", ["type", "op", "handler", "level"])
 
 _opcode_counter = metrics.MapCounter("vm_opcode")
+_builtins_code_metric = metrics.MapCounter("vm_builtins_code")
+_code_cache_metric = metrics.MapCounter("vm_code_cache")
+
+# Maps VirtualMachine subclasses to their dispatch tables, see
+# _get_dispatch_table.
+_dispatch_tables = {}
+
+# The processed code of __builtin__.py, keyed by (source, python version,
+# python exe). Code objects aren't modified after blocks.process_code, so all
+# VMs in a process can share them.
+_builtins_code = {}
 
 
 class RecursionException(Exception):
   pass
 
 
+def _get_dispatch_table(vm_class):
+  """Map every opcode class to the byte_* method of vm_class that runs it.
+
+  Args:
+    vm_class: VirtualMachine or a subclass.
+
+  Returns:
+    A dictionary from opcodes.Opcode subclasses to plain functions taking
+    (vm, state, op). Opcodes the VM doesn't implement aren't in the table.
+  """
+  table = _dispatch_tables.get(vm_class)
+  if table is None:
+    table = {}
+    for op_class in (set(opcodes.python2_mapping.values()) |
+                     set(opcodes.python3_mapping.values())):
+      method = getattr(vm_class, "byte_%s" % op_class.__name__, None)
+      if method is not None:
+        table[op_class] = method.__func__
+    _dispatch_tables[vm_class] = table
+  return table
+
+
 class VirtualMachineError(Exception):
   """For raising errors in the operation of the VM."""
   pass
@@ -177,6 +211,15 @@ class VirtualMachine(object):
     self.store_all_calls = store_all_calls
     self.loader = loader or (
         load_pytd.Loader(base_module=module_name, options=options))
+    self._dispatch_table = _get_dispatch_table(self.__class__)
+    # Per-instruction metrics and logging are expensive, so we decide once
+    # whether run_instruction needs to do them.
+    self._instrument_opcodes = (
+        metrics.enabled() or log.isEnabledFor(logging.INFO))
+    if options.code_cache_dir:
+      self._code_cache = blocks.CodeCache(options.code_cache_dir)
+    else:
+      self._code_cache = None
     self.frames = []  # The call stack of frames.
     self.functions_with_late_annotations = []
     self.frame = None  # The current frame.
@@ -189,6 +232,11 @@ class VirtualMachine(object):
     self.attribute_handler = attribute.AbstractAttributeHandler(self)
     self.has_unknown_wildcard_imports = False
     self.callself_stack = []
+    # Cache of InterpreterFunction.make_function.
+    self.function_cache = {}
+    # Number of calls so far that weren't analyzed, because of recursion or
+    # because they were beyond the maximum depth.
+    self.truncated_calls = 0
     self.filename = None
     self.type_comments = {}  # map from line number to (code, comment)
 
@@ -229,16 +277,16 @@ class VirtualMachine(object):
       FrameState right after this instruction that should roll over to the
       subsequent instruction.
     """
-    _opcode_counter.inc(op.name)
-    if log.isEnabledFor(logging.INFO):
+    if self._instrument_opcodes:
+      _opcode_counter.inc(op.name)
       self.log_opcode(op, state)
     self.frame.current_opcode = op
     try:
       # dispatch
-      bytecode_fn = getattr(self, "byte_%s" % op.name, None)
+      bytecode_fn = self._dispatch_table.get(op.__class__)
       if bytecode_fn is None:
         raise VirtualMachineError("Unknown opcode: %s" % op.name)
-      state = bytecode_fn(state, op)
+      state = bytecode_fn(self, state, op)
     except RecursionException as e:
       # This is not an error - it just means that the block we're analyzing
       # goes into a recursion, and we're already two levels deep.
@@ -468,7 +516,7 @@ class VirtualMachine(object):
 
       val.__cause__ = cause
 
-    state.set_exception(exc_type, val, val.__traceback__)
+    state = state.set_exception(exc_type, val, val.__traceback__)
     return state
 
   # Importing
@@ -572,6 +620,7 @@ class VirtualMachine(object):
     """Create a new frame object, using the given args, globals and locals."""
     if any(code is f.f_code for f in self.frames):
       log.info("Detected recursion in %s", code.co_name or code.co_filename)
+      self.truncated_calls += 1
       raise RecursionException()
 
     log.info("make_frame: callargs=%s, f_globals=[%s@%x], f_locals=[%s@%x]",
@@ -631,11 +680,23 @@ class VirtualMachine(object):
     return node, val
 
   def compile_src(self, src, filename=None, mode="exec"):
+    """Compile source code and order its blocks, using the code cache if any."""
+    if self._code_cache:
+      key = blocks.CodeCache.make_key(
+          src, self.python_version, self.options.python_exe, filename, mode)
+      code = self._code_cache.load(key)
+      if code:
+        _code_cache_metric.inc("hit")
+        return code
+      _code_cache_metric.inc("miss")
     code = pyc.compile_src(
         src, python_version=self.python_version,
         python_exe=self.options.python_exe,
         filename=filename, mode=mode)
-    return blocks.process_code(code)
+    code = blocks.process_code(code)
+    if self._code_cache:
+      self._code_cache.store(key, code)
+    return code
 
   def run_bytecode(self, node, code, f_globals=None, f_locals=None):
     frame = self.make_frame(node, code, f_globals=f_globals, f_locals=f_locals)
@@ -649,7 +710,13 @@ class VirtualMachine(object):
         src = fi.read()
     else:
       src = builtins.GetBuiltinsCode(self.python_version)
-    builtins_code = self.compile_src(src)
+    key = (src, self.python_version, self.options.python_exe)
+    builtins_code = _builtins_code.get(key)
+    if builtins_code is None:
+      _builtins_code_metric.inc("miss")
+      builtins_code = _builtins_code[key] = self.compile_src(src)
+    else:
+      _builtins_code_metric.inc("hit")
     node, f_globals, f_locals, _ = self.run_bytecode(node, builtins_code)
     assert not self.frames
     # TODO(kramm): pytype doesn't support namespacing of the currently parsed
@@ -1142,6 +1209,16 @@ class VirtualMachine(object):
       module = self.convert.unsolvable
     return module
 
+  def resolve_module_member(self, module, name, ty):
+    """Resolve a member of an imported module. See Loader.resolve_member."""
+    try:
+      return self.loader.resolve_member(module.name, ty)
+    except (parser.ParseError, load_pytd.BadDependencyError,
+            visitors.ContainerError, visitors.SymbolLookupError) as e:
+      self.errorlog.pyi_error(self.frame.current_opcode,
+                              module.name + "." + name, e)
+      return pytd.AnythingType()
+
   # TODO(kramm): memoize
   def _import_module(self, name, level):
     """Import the module and return the module object.
@@ -1746,9 +1823,10 @@ class VirtualMachine(object):
     if jump is not frame_state.UNSATISFIABLE:
       if jump:
         assert jump.binding
-        else_node = state.forward_cfg_node(jump.binding).forward_cfg_node()
+        else_node = state.snapshot().forward_cfg_node(
+            jump.binding).forward_cfg_node()
       else:
-        else_node = state.forward_cfg_node()
+        else_node = state.snapshot().forward_cfg_node()
       self.store_jump(op.target, else_node)
     else:
       else_node = None
@@ -1781,11 +1859,11 @@ class VirtualMachine(object):
     return self._jump_if(state, op, pop=True, jump_if=False)
 
   def byte_JUMP_FORWARD(self, state, op):
-    self.store_jump(op.target, state.forward_cfg_node())
+    self.store_jump(op.target, state.snapshot().forward_cfg_node())
     return state
 
   def byte_JUMP_ABSOLUTE(self, state, op):
-    self.store_jump(op.target, state.forward_cfg_node())
+    self.store_jump(op.target, state.snapshot().forward_cfg_node())
     return state
 
   def byte_SETUP_LOOP(self, state, op):
@@ -1802,7 +1880,7 @@ class VirtualMachine(object):
     self.frame.states[target] = state.merge_into(self.frame.states.get(target))
 
   def byte_FOR_ITER(self, state, op):
-    self.store_jump(op.target, state.pop_and_discard())
+    self.store_jump(op.target, state.snapshot().pop_and_discard())
     state, f = self.load_attr(state, state.top(), "next")
     state = state.push(f)
     return self.call_function_from_stack(state, 0, None, None)
@@ -1815,27 +1893,30 @@ class VirtualMachine(object):
     return state
 
   def byte_BREAK_LOOP(self, state, op):
-    new_state, block = self._revert_state_to(state, "loop").pop_block()
+    new_state, block = self._revert_state_to(
+        state.snapshot(), "loop").pop_block()
     while block.level < len(new_state.data_stack):
       new_state = new_state.pop_and_discard()
     self.store_jump(op.block_target, new_state)
     return state
 
   def byte_CONTINUE_LOOP(self, state, op):
-    new_state = self._revert_state_to(state, "loop")
+    new_state = self._revert_state_to(state.snapshot(), "loop")
     self.store_jump(op.target, new_state)
     return state
 
   def byte_SETUP_EXCEPT(self, state, op):
     # Assume that it's possible to throw the exception at the first
     # instruction of the code:
-    self.store_jump(op.target, self.push_abstract_exception(state))
+    self.store_jump(op.target,
+                    self.push_abstract_exception(state.snapshot()))
     return self.push_block(state, "setup-except", op, op.target)
 
   def byte_SETUP_FINALLY(self, state, op):
     # Emulate finally by connecting the try to the finally block (with
     # empty reason/why/continuation):
-    self.store_jump(op.target, state.push(self.convert.build_none(state.node)))
+    self.store_jump(op.target,
+                    state.snapshot().push(self.convert.build_none(state.node)))
     return self.push_block(state, "finally", op, op.target)
 
   def byte_POP_BLOCK(self, state, op):
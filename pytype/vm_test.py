@@ -1,12 +1,16 @@
 """Tests for vm.py."""
 
 import dis
+import gc
 import textwrap
+import weakref
 
 
 from pytype import blocks
 from pytype import config
 from pytype import errors
+from pytype import state as frame_state
+from pytype import utils
 from pytype import vm
 from pytype.pyc import pyc
 from pytype.pytd import cfg
@@ -180,6 +184,70 @@ class BytecodeTest(test_inference.InferenceTest):
       pass  # The code we test throws an exception. Ignore it.
     self.assertItemsEqual(self.trace_vm.instructions_executed, [0, 1, 5, 6])
 
+  def testPreloadBuiltinsReusesCode(self):
+    v1 = vm.VirtualMachine(errors.ErrorLog(), self.options)
+    _, globals1, _ = v1.preload_builtins(v1.root_cfg_node)
+    v2 = vm.VirtualMachine(errors.ErrorLog(), self.options)
+    v2.compile_src = None  # Fail if __builtin__.py is compiled again.
+    _, globals2, _ = v2.preload_builtins(v2.root_cfg_node)
+    self.assertItemsEqual(globals1.members, globals2.members)
+    abs1, = globals1.members["abs"].data
+    abs2, = globals2.members["abs"].data
+    self.assertIs(abs1.code, abs2.code)
+    self.assertIsNot(abs1, abs2)
+
+  def testFunctionCacheDoesNotKeepVM(self):
+    v = vm.VirtualMachine(errors.ErrorLog(), self.options)
+    v.preload_builtins(v.root_cfg_node)
+    ref = weakref.ref(v)
+    del v
+    gc.collect()
+    self.assertIsNone(ref())
+
+  def testDispatchTable(self):
+    class ReturnVM(vm.VirtualMachine):
+      def byte_RETURN_VALUE(self, state, op):
+        return state.set_why("test")
+    code = self.make_code([
+        0x64, 1, 0,  # 0 LOAD_CONST, arg=1 (1)
+        0x53,  # 3 RETURN_VALUE
+    ], name="simple")
+    load_const, return_value = blocks.process_code(code).co_code
+    v = ReturnVM(self.errorlog, self.options)
+    frame = v.make_frame(v.root_cfg_node, code)
+    v.push_frame(frame)
+    state = frame_state.FrameState.init(v.root_cfg_node)
+    state = v.run_instruction(load_const, state)
+    self.assertEquals("test", v.run_instruction(return_value, state).why)
+    # The base class has its own table.
+    self.assertIsNot(vm._get_dispatch_table(ReturnVM),
+                     vm._get_dispatch_table(vm.VirtualMachine))
+
+  def testUnknownOpcode(self):
+    code = blocks.process_code(self.make_code([0x53], name="simple"))
+    v = vm.VirtualMachine(self.errorlog, self.options)
+    frame = v.make_frame(v.root_cfg_node, code)
+    v.push_frame(frame)
+    op = code.co_code[0].at_line(1)  # a plain Opcode, which the VM can't run
+    self.assertRaises(vm.VirtualMachineError, v.run_instruction, op, None)
+
+  def testCodeCache(self):
+    with utils.Tempdir() as d:
+      self.options.tweak(code_cache_dir=d.path)
+      v1 = vm.VirtualMachine(errors.ErrorLog(), self.options)
+      code1 = v1.compile_src(self.src_nested_loop, filename="foo.py")
+      v2 = vm.VirtualMachine(errors.ErrorLog(), self.options)
+      old_compile_src = pyc.compile_src
+      pyc.compile_src = None  # Fail if the source is compiled again.
+      try:
+        code2 = v2.compile_src(self.src_nested_loop, filename="foo.py")
+      finally:
+        pyc.compile_src = old_compile_src
+    self.assertIsNot(code1, code2)
+    self.assertEquals([str(op) for op in code1.co_code],
+                      [str(op) for op in code2.co_code])
+    self.assertEquals([b.id for b in code1.order], [b.id for b in code2.order])
+
 
 if __name__ == "__main__":
   test_inference.main()